@@ -3,54 +3,119 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-import pgeocode
 import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from aggregates import dataset_fingerprint, load_dashboard_sample, preview_aggregates
+from datastore import has_star_schema, ratings_source
+from figure_cache import FigureCache
+from filter_index import filtered_aggregates, load_filter_index, select_rows, split_genres
+from geo_manifest import geojson_feature_key
+from hexbin import HEX_SIZES, bin_zip_sums, hex_stats, load_hexbins, zip_sums_from_stats
+from profiling import log_record, start_run, tracked
+from rollup_cube import cube_aggregates, cube_decades, cube_genres, load_cube
+from warmup import log_first_paint, warm_start
+from zcta_shards import ZCTA_GEOJSON, has_shards, load_index, pick_shard_dir, state_geojson
+from zip_lookup import load_zip_arrays
+
+RUN_T0 = time.perf_counter()
+MAX_MOVIE_OPTIONS = 50  # movie search results sent as selectbox options
+profile = start_run()  # per-rerun section timings + cache hit/miss (shown when Profiling is on)
 
 # --- 1) Page ---
 st.set_page_config(layout="wide", page_title="USA MovieLens Ratings Map")
 
 # --- 2) Helpers ---
-def calculate_weighted_rating(df, m=None):
-    """
-    IMDb-style weighted rating:
-    WR = (v/(v+m))*R + (m/(v+m))*C
-    """
-    v = df["Rating_Count"]
-    R = df["Avg_Rating"]
-    C = df["Avg_Rating"].mean()
-    if m is None:
-        m = v.quantile(0.50)  # median
-    df["Weighted_Score"] = (v / (v + m) * R) + (m / (v + m) * C)
-    df["_C_global"] = C
-    df["_m_used"] = m
-    return df
-
-@st.cache_data
-def load_data():
-    df = pd.read_csv("usa_ratings_lite.csv", low_memory=False)
-    
-    usa_df = df.copy()
-
-    nomi = pgeocode.Nominatim("us")
-    usa_df["Zip-code"] = usa_df["Zip-code"].astype(str).str.split("-").str[0].str.strip()
-
-    unique_zips = usa_df["Zip-code"].dropna().unique()
-    geo_data = nomi.query_postal_code(unique_zips)
-    geo_data = geo_data.dropna(subset=["latitude", "longitude", "state_code"])
-
-    geo_info = geo_data[["postal_code", "latitude", "longitude", "place_name", "state_code", "state_name"]].copy()
-    
-    geo_info.columns = ["Zip-code", "lat", "lon", "City_Name", "State_Code", "State"]
-    
-    geo_info["State_Code"] = geo_info["State_Code"].astype(str).str.upper()
-
-    merged = pd.merge(usa_df, geo_info, on="Zip-code", how="inner")
-    return merged
+# cache_resource, not cache_data: one shared object per process instead of a pickled copy per
+# session. Read-only by contract - sessions only slice these (copy-on-write), never edit them.
+@tracked(st.cache_resource)
+def start_aggregates(fingerprint):
+    # Keyed by the dataset fingerprint: one background load (a Future) shared by all sessions.
+    # Aggregates and geometry indexes load concurrently, raw ratings only when the aggregate cache is cold
+    # (python warmup.py fills it before the first session)
+    pool = ThreadPoolExecutor(max_workers=1)
+    future = pool.submit(warm_start, fingerprint)
+    pool.shutdown(wait=False)
+    return future
+
+@tracked(st.cache_resource)
+def get_preview(fingerprint):
+    # Sampled aggregates (with CI95), shown while the exact ones are still loading. The sample is
+    # read on its own (a few Parquet row groups), so it doesn't wait for the full raw load
+    return preview_aggregates(*load_dashboard_sample())
+
+@tracked(st.cache_resource)
+def get_figure_cache():
+    # Finished figures keyed by (view, state, metric, min votes, dataset fingerprint, filters), shared by all sessions
+    return FigureCache()
+
+@tracked(st.cache_resource)
+def get_filter_index(fingerprint):
+    # Memory-mapped genre / decade / movie row indexes (python filter_index.py), None if missing or stale.
+    # Built from the star fact table: with another source the filtered maps would show other ratings
+    if ratings_source() != "star":
+        return None
+    return load_filter_index()
+
+@tracked(st.cache_resource)
+def get_movie_labels(fingerprint):
+    # "Title (Year)" per rated movie, built once per dataset instead of on every rerun
+    movies = get_filter_index(fingerprint)["movies"]
+    labels = movies["Title"].astype(str)
+    if "Release_Year" in movies.columns:
+        labels = labels + " (" + movies["Release_Year"].astype("Int64").astype(str) + ")"
+    return labels.reset_index(drop=True)
+
+@tracked(st.cache_resource(max_entries=64))
+def find_movies(fingerprint, genre, decade, query):
+    # Up to MAX_MOVIE_OPTIONS (movie_id, label) pairs whose title contains query, within the chosen genre / decade
+    movies = get_filter_index(fingerprint)["movies"]
+    labels = get_movie_labels(fingerprint)
+    mask = labels.str.contains(query, case=False, regex=False).to_numpy(copy=True)
+    if genre is not None and "Genres" in movies.columns:
+        mask &= split_genres(movies["Genres"]).map(lambda g: genre in g).to_numpy()
+    if decade is not None and "Decade" in movies.columns:
+        mask &= (pd.to_numeric(movies["Decade"], errors="coerce") == decade).to_numpy()
+    hits = mask.nonzero()[0][:MAX_MOVIE_OPTIONS]
+    return movies["movie_id"].to_numpy()[hits].tolist(), labels.to_numpy()[hits].tolist()
+
+@tracked(st.cache_resource)
+def get_cube(fingerprint):
+    # State x ZIP x Decade x Genres rollup (python rollup_cube.py), None if missing or stale.
+    # Built from the star fact table, so only used with that source (like in load_aggregates)
+    if ratings_source() != "star":
+        return None
+    return load_cube()
+
+@tracked(st.cache_resource(max_entries=64))
+def get_filtered_aggregates(fingerprint, genre, decade, movie_id):
+    # Genre / decade slices are sums of cube cells; a single movie needs the row index
+    cube = get_cube(fingerprint)
+    if cube is not None and movie_id is None:
+        return cube_aggregates(cube, genre, decade)
+    index = get_filter_index(fingerprint)
+    return filtered_aggregates(index, select_rows(index, genre, decade, movie_id))
+
+@tracked(st.cache_resource(max_entries=64))
+def get_hex_cells(fingerprint, genre, decade, movie_id, preview):
+    # Precomputed hex cells (python hexbin.py) for the exact unfiltered map; any other map is
+    # binned here from its per-ZIP aggregates (a few thousand ZIPs, not rating rows)
+    if (genre, decade, movie_id) == (None, None, None) and not preview:
+        cells = load_hexbins()
+        if cells is not None:
+            return cells
+        zip_stats = start_aggregates(fingerprint).result()[1]
+    elif preview:
+        zip_stats = get_preview(fingerprint)[1]
+    else:
+        zip_stats = get_filtered_aggregates(fingerprint, genre, decade, movie_id)[1]
+    return bin_zip_sums(zip_sums_from_stats(zip_stats), load_zip_arrays())
 
-@st.cache_data
+@tracked(st.cache_resource)
 def load_zcta_geojson():
-    geojson_path = r"zcta.geojson.json"
-    with open(geojson_path, "r", encoding="utf-8") as f:
+    with open(ZCTA_GEOJSON, "r", encoding="utf-8") as f:
         return json.load(f)
 
 # State label positions (approx. centroids) for abbreviations on the US map
@@ -75,11 +140,24 @@ STATE_LABEL_POS = {
     "DC": (38.907192, -77.036871),
 }
 
-ZCTA_KEY = "ZCTA5CE10"
-zcta_geojson = load_zcta_geojson()
-data = load_data()
+fingerprint = dataset_fingerprint()
+fast_preview = st.sidebar.checkbox("Fast preview on cold start (sampled)", value=False)
+profiling = st.sidebar.checkbox("Profiling (timing breakdown)", value=False)
+exact_aggregates = start_aggregates(fingerprint)
 
-if data is None or data.empty:
+# Preview only if the exact aggregates aren't there within half a second (warm cache -> always exact)
+with profile.section("aggregates"):
+    preview = fast_preview and bool(wait([exact_aggregates], timeout=0.5).not_done)
+    try:
+        state_stats, zip_stats = get_preview(fingerprint) if preview else exact_aggregates.result()
+    except Exception as e:
+        # Don't keep the failed Future cached: the next rerun starts a new load instead of re-raising this
+        start_aggregates.clear()
+        st.error(f"Failed to load data: {e}")
+        st.stop()
+figure_cache = get_figure_cache()
+
+if state_stats is None or state_stats.empty:
     st.error("Failed to load data.")
     st.stop()
 
@@ -91,7 +169,11 @@ if "selected_state" not in st.session_state:
 st.sidebar.header("Controls")
 
 
+map_mode = "States"
 if st.session_state.selected_state == "All USA":
+    map_mode = st.sidebar.radio("National map:", ["States", "ZIP hex bins"], index=0)
+
+if st.session_state.selected_state == "All USA" and map_mode == "States":
     metric_mode = st.sidebar.radio(
         "Metric (States):",
         options=[
@@ -113,36 +195,51 @@ else:
     )
 
 min_zip_votes = st.sidebar.slider("Min ZIP votes (drilldown):", 0, 300, 20)
+if map_mode == "ZIP hex bins":
+    hex_size = st.sidebar.select_slider("Hex size (degrees):", options=HEX_SIZES, value=0.5)
 
 if st.session_state.selected_state != "All USA":
     if st.sidebar.button("Back to USA"):
         st.session_state.selected_state = "All USA"
         st.rerun()
 
-# --- Aggregations ---
-state_stats = data.groupby(["State_Code", "State"]).agg(
-    Avg_Rating=("rating", "mean"),
-    Rating_Count=("rating", "count")
-).reset_index()
-
-state_stats = state_stats.dropna(subset=["State_Code"])
-state_stats = calculate_weighted_rating(state_stats)
-
-zip_stats = data.groupby(["State_Code", "Zip-code"]).agg(
-    Avg_Rating=("rating", "mean"),
-    Rating_Count=("rating", "count")
-).reset_index()
-
-zip_stats = calculate_weighted_rating(zip_stats)
-zip_stats["Zip-code"] = zip_stats["Zip-code"].astype(str).str.zfill(5)
-
-# Global mean (for Δ)
-C_global = float(state_stats["Avg_Rating"].mean())
-state_stats["Delta"] = state_stats["Avg_Rating"] - C_global
-zip_stats["Delta"] = zip_stats["Avg_Rating"] - C_global
-
-state_stats["Delta_fmt"] = state_stats["Delta"].map(lambda x: f"{x:+.3f}")
-zip_stats["Delta_fmt"] = zip_stats["Delta"].map(lambda x: f"{x:+.3f}")
+# --- Sidebar: rating filters (when the filter index or the rollup cube is built for this dataset) ---
+filter_index = get_filter_index(fingerprint)
+cube = get_cube(fingerprint)
+active_filters = (None, None, None)  # genre, decade, movie_id
+if filter_index is not None or cube is not None:
+    st.sidebar.subheader("Filter ratings")
+    genres = cube_genres(cube) if cube is not None else sorted(filter_index["genre"])
+    decades = cube_decades(cube) if cube is not None else sorted(filter_index["decade"])
+    genre = st.sidebar.selectbox("Genre:", ["All genres"] + genres)
+    decade = st.sidebar.selectbox("Decade:", ["All decades"] + decades,
+                                  format_func=lambda d: d if isinstance(d, str) else f"{d}s")
+    genre = None if genre == "All genres" else genre
+    decade = None if decade == "All decades" else int(decade)
+
+    # Movie: a title search within the chosen genre / decade, so only a few matches go to the browser
+    movie_id = None
+    if filter_index is not None:
+        movie_query = st.sidebar.text_input("Movie (search by title):", "").strip()
+        if movie_query:
+            movie_ids, movie_labels = find_movies(fingerprint, genre, decade, movie_query)
+            if movie_ids:
+                movie_pos = st.sidebar.selectbox("Movie:", range(len(movie_ids)), format_func=lambda i: movie_labels[i])
+                movie_id = int(movie_ids[movie_pos])
+                if len(movie_ids) == MAX_MOVIE_OPTIONS:
+                    st.sidebar.caption(f"First {MAX_MOVIE_OPTIONS} matches - type more of the title to narrow down.")
+            else:
+                st.sidebar.caption("No movie matches this search.")
+
+    active_filters = (genre, decade, movie_id)
+    if active_filters != (None, None, None):
+        state_stats, zip_stats = get_filtered_aggregates(fingerprint, *active_filters)
+        preview = False
+        if state_stats is None:
+            st.warning("No ratings match these filters.")
+            st.stop()
+elif ratings_source() != "star" and has_star_schema():
+    st.sidebar.caption("Rating filters read the star fact table: set RATINGS_SOURCE=star to use them.")
 
 # --- Color scales ---
 custom_red_white_green = [
@@ -175,10 +272,7 @@ elif metric_mode == "Number of Ratings":
     zmin, zmax = 0, None
     metric_title = "Number of Ratings"
 
-else:  # Δ
-    state_stats["Delta"] = state_stats["Avg_Rating"] - C_global
-    zip_stats["Delta"] = zip_stats["Avg_Rating"] - C_global
-
+else:  # Δ (precomputed with the aggregates)
     col = "Delta"
     colorscale = custom_red_white_green
     metric_title = "Δ from Global Mean"
@@ -207,6 +301,8 @@ st.markdown(
 )
 
 st.caption("Click a state to zoom into ZIP areas.")
+if preview:
+    st.info("Fast preview from a sample of ratings - the exact map replaces it as soon as it is ready.")
 
 # --- Sidebar: Show IMDb-style formula ---
 if metric_mode == "Weighted Rating (IMDb formula)":
@@ -219,81 +315,168 @@ if metric_mode == "Weighted Rating (IMDb formula)":
         st.write("R = entity average rating, v = entity vote count")
         st.write("Higher m ⇒ stronger pull toward the global mean.")
 
+# --- Preview: 95% confidence interval of the average in the hover text ---
+ci_columns = ["CI95"] if preview else []
+ci_hover_state = "95% CI (preview): ±%{customdata[5]:.3f}<br>" if preview else ""
+ci_hover_zip = "95% CI (preview): ±%{customdata[4]:.3f}<br>" if preview else ""
+
 # ---------------------------
-# VIEW 1: All USA (States)
+# VIEW 1b: All USA (ZIP hex bins)
 # ---------------------------
-if st.session_state.selected_state == "All USA":
-    fig = go.Figure()
-    if metric_mode == "Number of Ratings":
-        hovertemplate_state = (
-            "<b>%{customdata[0]} (%{text})</b><br>"
-            "Number of Ratings: %{z}<br>"
-            "Average: %{customdata[2]:.3f}<br>"
-            "Weighted Rating: %{customdata[3]:.3f}<br>"
-            "Above/Below U.S. Average: %{customdata[4]}"
+if st.session_state.selected_state == "All USA" and map_mode == "ZIP hex bins":
+    C_map = float(state_stats["Avg_Rating"].mean())  # same U.S. mean as the state map's Δ
+    hexes = hex_stats(get_hex_cells(fingerprint, *active_filters, preview), hex_size, C_map)
+    if col == "Delta":
+        bound = float(hexes["Delta"].abs().quantile(0.95))
+        zmin, zmax = -bound, bound
+
+    fig_key = ("hexes", hex_size, metric_mode, None, fingerprint, active_filters, preview)
+    fig = figure_cache.get(fig_key)
+    profile.cache["figure_cache"] = "miss" if fig is None else "hit"
+    if fig is None:
+        t_build = time.perf_counter()
+        hovertemplate_hex = (
+            "<b>%{customdata[0]} · %{customdata[1]} ZIPs</b><br>"
+            f"{metric_title}: %{{marker.color:.3f}}<br>"
+            "Votes: %{customdata[2]}<br>"
+            "Avg: %{customdata[3]:.3f}<br>"
+            "Weighted: %{customdata[4]:.3f}<br>"
+            "Above/Below U.S. mean: %{customdata[5]}"
             "<extra></extra>"
         )
-    else:
-        hovertemplate_state = (
-            "<b>%{customdata[0]} (%{text})</b><br>"
-            f"{metric_title}: %{{z:.3f}}<br>"
-            "Number of Ratings: %{customdata[1]}<br>"
-            "Average: %{customdata[2]:.3f}<br>"
-            "Weighted: %{customdata[3]:.3f}<br>"
-            "Above/Below U.S. Average: %{customdata[4]}"
-            "<extra></extra>"
+        fig = go.Figure(go.Scattergeo(
+            lat=hexes["lat"].round(4),
+            lon=hexes["lon"].round(4),
+            mode="markers",
+            marker=dict(
+                symbol="hexagon",
+                size=40 * hex_size,  # ~px across one cell at this map size
+                color=hexes[col],
+                colorscale=colorscale,
+                cmin=zmin, cmax=zmax,
+                line_width=0,
+                colorbar_title=metric_title,
+            ),
+            customdata=hexes[["State_Code", "n_zips", "Rating_Count", "Avg_Rating", "Weighted_Score", "Delta_fmt"]],
+            hovertemplate=hovertemplate_hex,
+        ))
+        fig.update_layout(
+            geo=dict(
+                scope="usa",
+                projection_type="albers usa",
+                showlakes=True,
+                lakecolor="rgb(255,255,255)",
+            ),
+            clickmode="event+select",
+            margin={"r": 0, "t": 10, "l": 0, "b": 0},
+            height=650
+        )
+        profile.add("figure_build", t_build)
+        figure_cache.put(fig_key, fig)
+
+    with profile.section("plotly_chart"):
+        event = st.plotly_chart(
+            fig,
+            use_container_width=True,
+            on_select="rerun",
+            selection_mode="points"
         )
 
-    fig.add_trace(go.Choropleth(
-        locations=state_stats["State_Code"],
-        z=state_stats[col],
-        locationmode="USA-states",
-        colorscale=colorscale,
-        zmin=zmin, zmax=zmax,
-        text=state_stats["State_Code"],
-        customdata=state_stats[["State", "Rating_Count", "Avg_Rating", "Weighted_Score", "Delta_fmt"]],
-        hovertemplate=hovertemplate_state,
-        marker_line_color="white",
-        marker_line_width=1,
-        colorbar_title="Value"
-    ))
-
-    # State abbreviations labels
-    label_lats, label_lons, label_text = [], [], []
-    for sc in sorted(state_stats["State_Code"].unique()):
-        if sc in STATE_LABEL_POS:
-            lat, lon = STATE_LABEL_POS[sc]
-            label_lats.append(lat)
-            label_lons.append(lon)
-            label_text.append(sc)
-
-    fig.add_trace(go.Scattergeo(
-        lat=label_lats,
-        lon=label_lons,
-        mode="text",
-        text=label_text,
-        textfont=dict(size=10),
-        hoverinfo="skip"
-    ))
-
-    fig.update_layout(
-        geo=dict(
-            scope="usa",
-            projection_type="albers usa",
-            showlakes=True,
-            lakecolor="rgb(255,255,255)",
-        ),
-        clickmode="event+select",
-        margin={"r": 0, "t": 10, "l": 0, "b": 0},
-        height=650
-    )
+    # Clicking a cell drills into the state holding most of its ratings
+    try:
+        points = event.selection.get("points", [])
+    except Exception:
+        points = []
 
-    event = st.plotly_chart(
-        fig,
-        use_container_width=True,
-        on_select="rerun",
-        selection_mode="points"
-    )
+    if points and points[0].get("point_index") is not None:
+        st.session_state.selected_state = hexes["State_Code"].iloc[points[0]["point_index"]]
+        st.rerun()
+
+# ---------------------------
+# VIEW 1: All USA (States)
+# ---------------------------
+elif st.session_state.selected_state == "All USA":
+    fig_key = ("states", None, metric_mode, None, fingerprint, active_filters, preview)
+    fig = figure_cache.get(fig_key)
+    profile.cache["figure_cache"] = "miss" if fig is None else "hit"
+    if fig is None:
+        t_build = time.perf_counter()
+        fig = go.Figure()
+        if metric_mode == "Number of Ratings":
+            hovertemplate_state = (
+                "<b>%{customdata[0]} (%{text})</b><br>"
+                "Number of Ratings: %{z}<br>"
+                "Average: %{customdata[2]:.3f}<br>"
+                f"{ci_hover_state}"
+                "Weighted Rating: %{customdata[3]:.3f}<br>"
+                "Above/Below U.S. Average: %{customdata[4]}"
+                "<extra></extra>"
+            )
+        else:
+            hovertemplate_state = (
+                "<b>%{customdata[0]} (%{text})</b><br>"
+                f"{metric_title}: %{{z:.3f}}<br>"
+                "Number of Ratings: %{customdata[1]}<br>"
+                "Average: %{customdata[2]:.3f}<br>"
+                f"{ci_hover_state}"
+                "Weighted: %{customdata[3]:.3f}<br>"
+                "Above/Below U.S. Average: %{customdata[4]}"
+                "<extra></extra>"
+            )
+
+        fig.add_trace(go.Choropleth(
+            locations=state_stats["State_Code"],
+            z=state_stats[col],
+            locationmode="USA-states",
+            colorscale=colorscale,
+            zmin=zmin, zmax=zmax,
+            text=state_stats["State_Code"],
+            customdata=state_stats[["State", "Rating_Count", "Avg_Rating", "Weighted_Score", "Delta_fmt"] + ci_columns],
+            hovertemplate=hovertemplate_state,
+            marker_line_color="white",
+            marker_line_width=1,
+            colorbar_title="Value"
+        ))
+
+        # State abbreviations labels
+        label_lats, label_lons, label_text = [], [], []
+        for sc in sorted(state_stats["State_Code"].unique()):
+            if sc in STATE_LABEL_POS:
+                lat, lon = STATE_LABEL_POS[sc]
+                label_lats.append(lat)
+                label_lons.append(lon)
+                label_text.append(sc)
+
+        fig.add_trace(go.Scattergeo(
+            lat=label_lats,
+            lon=label_lons,
+            mode="text",
+            text=label_text,
+            textfont=dict(size=10),
+            hoverinfo="skip"
+        ))
+
+        fig.update_layout(
+            geo=dict(
+                scope="usa",
+                projection_type="albers usa",
+                showlakes=True,
+                lakecolor="rgb(255,255,255)",
+            ),
+            clickmode="event+select",
+            margin={"r": 0, "t": 10, "l": 0, "b": 0},
+            height=650
+        )
+        profile.add("figure_build", t_build)
+        figure_cache.put(fig_key, fig)
+
+    with profile.section("plotly_chart"):
+        event = st.plotly_chart(
+            fig,
+            use_container_width=True,
+            on_select="rerun",
+            selection_mode="points"
+        )
 
 
 
@@ -314,95 +497,131 @@ if st.session_state.selected_state == "All USA":
 else:
     state_code = st.session_state.selected_state
 
-    # 1. סינון נתונים
-    subset_zip = zip_stats[(zip_stats["State_Code"] == state_code) & (zip_stats["Rating_Count"] >= min_zip_votes)].copy()
-    if subset_zip.empty:
-        st.warning(f"No ZIP areas found for {state_code} after applying Min ZIP votes.")
-        st.stop()
-
-    zip_set = set(subset_zip["Zip-code"].astype(str))
+    fig_key = ("zips", state_code, metric_mode, min_zip_votes, fingerprint, active_filters, preview)
+    fig = figure_cache.get(fig_key)
+    profile.cache["figure_cache"] = "miss" if fig is None else "hit"
+    if fig is None:
+        # 1. סינון נתונים
+        t_filter = time.perf_counter()
+        subset_zip = zip_stats[(zip_stats["State_Code"] == state_code) & (zip_stats["Rating_Count"] >= min_zip_votes)].copy()
+        if subset_zip.empty:
+            st.warning(f"No ZIP areas found for {state_code} after applying Min ZIP votes.")
+            st.stop()
+
+        zip_set = set(subset_zip["Zip-code"].astype(str))
+        profile.add("zip_filter", t_filter)
+        t_geojson = time.perf_counter()
     
-    # 2. חישוב המפתח הנכון ב-JSON
-    sample_feature = zcta_geojson["features"][0]["properties"]
-    feature_key = ZCTA_KEY 
-    if ZCTA_KEY not in sample_feature:
-        for k in sample_feature.keys():
-            if "ZCTA" in k or "zip" in k.lower():
-                feature_key = k
-                break
+        if has_shards():
+            # 2+3. Per-state shard (lazy, LRU-cached) of the lightest geometry variant that suits this view
+            shard_dir = pick_shard_dir(len(zip_set))
+            feature_key = load_index(shard_dir)["feature_key"]
+            filtered_geojson = state_geojson(state_code, zip_set, shard_dir)
+        else:
+            # Fallback: no shards built yet (python zcta_shards.py) -> scan the national file
+            zcta_geojson = load_zcta_geojson()
+
+            # 2. המפתח הנכון ב-JSON (מקובץ ה-manifest, בלי לסרוק את ה-GeoJSON)
+            feature_key = geojson_feature_key(ZCTA_GEOJSON)
+
+            # 3. יצירת ה-GeoJSON המסונן
+            filtered_geojson = {
+                "type": "FeatureCollection",
+                "features": [
+                    feat for feat in zcta_geojson["features"]
+                    if str(feat["properties"].get(feature_key, "")).zfill(5) in zip_set
+                ]
+            }
     
-    # 3. יצירת ה-GeoJSON המסונן
-    filtered_geojson = {
-        "type": "FeatureCollection",
-        "features": [
-            feat for feat in zcta_geojson["features"]
-            if str(feat["properties"].get(feature_key, "")).zfill(5) in zip_set
-        ]
-    }
+        profile.add("geojson_filter", t_geojson)
+        if not filtered_geojson["features"]:
+            st.error(f"Error: Data mismatch. We have data for {len(subset_zip)} ZIPs, but none matched the Map file.")
+            st.stop()
+
+        t_build = time.perf_counter()
+        fig = go.Figure()
+
+        # הגדרת הטקסט המרחף
+        if metric_mode == "Number of Ratings":
+            hovertemplate_zip = (
+                "<b>ZIP: %{location}</b><br>"
+                "Votes: %{z}<br>"
+                "Avg: %{customdata[1]:.3f}<br>"
+                f"{ci_hover_zip}"
+                "Weighted: %{customdata[2]:.3f}<br>"
+                "Above/Below U.S. mean: %{customdata[3]}"
+                "<extra></extra>"
+            )
+        else:
+            hovertemplate_zip = (
+                "<b>ZIP: %{location}</b><br>"
+                f"{metric_title}: %{{z:.3f}}<br>"
+                "Votes: %{customdata[0]}<br>"
+                "Avg: %{customdata[1]:.3f}<br>"
+                f"{ci_hover_zip}"
+                "Weighted: %{customdata[2]:.3f}<br>"
+                "Above/Below U.S. mean: %{customdata[3]}"
+                "<extra></extra>"
+            )
+
+        # --- שכבה יחידה: המיקודים הצבעוניים (הנתונים) ---
+        fig.add_trace(go.Choropleth(
+            geojson=filtered_geojson,
+            locations=subset_zip["Zip-code"],
+            featureidkey=f"properties.{feature_key}",
+            z=subset_zip[col],
+            colorscale=colorscale,
+            zmin=zmin, zmax=zmax,
+            marker_line_width=0, # ללא קו מתאר למיקודים עצמם
+            colorbar_title=metric_title,
+            customdata=subset_zip[["Rating_Count", "Avg_Rating", "Weighted_Score", "Delta_fmt"] + ci_columns],
+            hovertemplate=hovertemplate_zip,
+        ))
+
+        # הסרנו מכאן את ה-Trace השני שעשה את הבעיות!
     
-    if not filtered_geojson["features"]:
-        st.error(f"Error: Data mismatch. We have data for {len(subset_zip)} ZIPs, but none matched the Map file.")
-        st.stop()
-
-    fig = go.Figure()
-
-    # הגדרת הטקסט המרחף
-    if metric_mode == "Number of Ratings":
-        hovertemplate_zip = (
-            "<b>ZIP: %{location}</b><br>"
-            "Votes: %{z}<br>"
-            "Avg: %{customdata[1]:.3f}<br>"
-            "Weighted: %{customdata[2]:.3f}<br>"
-            "Above/Below U.S. mean: %{customdata[3]}"
-            "<extra></extra>"
+        fig.update_layout(
+            geo=dict(
+                scope="usa",
+                projection_type="albers usa",
+                fitbounds="locations", # זה ידאג שהמפה תתמקד בול על המיקודים שיש לנו
+                visible=True,
+                bgcolor="rgba(0,0,0,0)"
+            ),
+            margin={"r": 0, "t": 10, "l": 0, "b": 0},
+            height=650
         )
-    else:
-        hovertemplate_zip = (
-            "<b>ZIP: %{location}</b><br>"
-            f"{metric_title}: %{{z:.3f}}<br>"
-            "Votes: %{customdata[0]}<br>"
-            "Avg: %{customdata[1]:.3f}<br>"
-            "Weighted: %{customdata[2]:.3f}<br>"
-            "Above/Below U.S. mean: %{customdata[3]}"
-            "<extra></extra>"
-        )
-
-    # --- שכבה יחידה: המיקודים הצבעוניים (הנתונים) ---
-    fig.add_trace(go.Choropleth(
-        geojson=filtered_geojson,
-        locations=subset_zip["Zip-code"],
-        featureidkey=f"properties.{feature_key}",
-        z=subset_zip[col],
-        colorscale=colorscale,
-        zmin=zmin, zmax=zmax,
-        marker_line_width=0, # ללא קו מתאר למיקודים עצמם
-        colorbar_title=metric_title,
-        customdata=subset_zip[["Rating_Count", "Avg_Rating", "Weighted_Score", "Delta_fmt"]],
-        hovertemplate=hovertemplate_zip,
-    ))
-
-    # הסרנו מכאן את ה-Trace השני שעשה את הבעיות!
-    
-    fig.update_layout(
-        geo=dict(
-            scope="usa",
-            projection_type="albers usa",
-            fitbounds="locations", # זה ידאג שהמפה תתמקד בול על המיקודים שיש לנו
-            visible=True,
-            bgcolor="rgba(0,0,0,0)"
-        ),
-        margin={"r": 0, "t": 10, "l": 0, "b": 0},
-        height=650
-    )
+        profile.add("figure_build", t_build)
+        figure_cache.put(fig_key, fig)
 
     st.subheader(f"{state_code} — ZIP-level view")
-    st.plotly_chart(fig, use_container_width=True)
-    
-
-
-
-
-
-
-
-
+    with profile.section("plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
+# --- Time to first paint (once per session) ---
+if "first_paint_logged" not in st.session_state:
+    st.session_state.first_paint_logged = True
+    log_first_paint(RUN_T0)
+
+# --- Profiling (opt-in): timing breakdown of this rerun in the sidebar + one JSON line in the log ---
+if profiling:
+    if "profile_session" not in st.session_state:
+        st.session_state.profile_session = uuid.uuid4().hex[:8]
+    record = profile.record(
+        session=st.session_state.profile_session,
+        view=st.session_state.selected_state,
+        metric=metric_mode,
+        min_zip_votes=min_zip_votes,
+        filters=list(active_filters),
+        preview=preview,
+    )
+    log_record(record)
+    with st.sidebar.expander("Timing breakdown", expanded=True):
+        st.write(f"Rerun total: {record['total_ms']:.0f} ms")
+        st.table(pd.DataFrame({"ms": record["sections"]}))
+        st.table(pd.DataFrame({"cache": record["cache"]}))
+
+# --- Preview shown: swap in the exact aggregates as soon as they are ready ---
+if preview:
+    exact_aggregates.result()
+    st.rerun()
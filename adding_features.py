@@ -1,56 +1,208 @@
+import argparse
+import glob
+import os
+
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from datastore import MOVIE_COLUMNS, MOVIES_DIM, RATINGS_FACT_DIR, ROW_GROUP_ROWS, normalize_zip, read_csv_compact
+from running_stats import combine_partials, finalize_stats, partial_stats
+
+INPUT_FILE = 'final_movies_dataset_enriched_full.csv'
+OUTPUT_FILE = 'final_project_data_ready.csv'
+MOVIE_KEYS = ['Title', 'Release_Year']
+
+
+def add_roi_and_decade(df):
+    # --- Step B: Calculate ROI (Financial Success) ---
+    # Ensure budget and revenue are numeric
+    df['budget'] = pd.to_numeric(df['budget'], errors='coerce')
+    df['revenue'] = pd.to_numeric(df['revenue'], errors='coerce')
+
+    # Calculate ROI: (Revenue - Budget) / Budget
+    # We use np.where to avoid DivisionByZero errors if budget is 0 or NaN
+    # Logic: If budget > 1000 (filtering out tiny/error budgets) AND revenue exists -> Calculate. Else -> NaN.
+    valid_budget = (df['budget'] > 1000) & (df['revenue'].notna())
+
+    df['ROI'] = np.where(
+        valid_budget,
+        (df['revenue'] - df['budget']) / df['budget'],
+        np.nan
+    )
+
+    # --- Step C: Create 'Decade' column (Bonus for visualizations) ---
+    # This is very useful for the visualizations we discussed (Ridgeline plots etc.)
+    df['Decade'] = (df['Release_Year'] // 10) * 10
+    return df
+
+
+def run_in_memory(input_file=INPUT_FILE, output_file=OUTPUT_FILE, memory_report=False):
+    # 1. Load the enriched dataset (compact dtypes: float32 ratings, categorical titles, ...)
+    print("Loading data...")
+    df = read_csv_compact(input_file, keep_text=True, report=memory_report)
+
+    # --- Step A: Calculate Rating Statistics (Per Movie) ---
+    print("Calculating rating statistics (Count, Mean, Std)...")
+
+    # We group by Title and Release_Year to ensure we treat each movie individually
+    # 'rating' is the column we are analyzing
+    movie_stats = df.groupby(MOVIE_KEYS, observed=True)['rating'].agg(
+        Rating_Count='count',      # Popularity
+        Avg_Rating='mean',         # Quality
+        Controversy_Score='std'    # Controversy (Standard Deviation)
+    ).reset_index()
+
+    # Handle cases where std is NaN (movies with only 1 rating have no deviation)
+    movie_stats['Controversy_Score'] = movie_stats['Controversy_Score'].fillna(0)
+
+    # Merge these new stats back into the main dataframe
+    # This adds the 3 new columns to every row based on the movie
+    df = pd.merge(df, movie_stats, on=MOVIE_KEYS, how='left')
+
+    print("Calculating ROI...")
+    df = add_roi_and_decade(df)
+
+    # --- Save Final File ---
+    df.to_csv(output_file, index=False)
+    return df
+
+
+def movie_key_index(chunk):
+    # Same key in both passes, even if one chunk parses Release_Year as int and another as float
+    return pd.MultiIndex.from_arrays(
+        [chunk['Title'], pd.to_numeric(chunk['Release_Year'], errors='coerce')],
+        names=MOVIE_KEYS
+    )
+
+
+# Parquet types of the fact table, the same for every part file whatever a chunk holds. Zip-code in
+# particular: a pandas category picks its code width per chunk (int8 for <128 ZIPs, int16 above)
+FACT_TYPES = {
+    'movie_id': pa.int32(),
+    'user_id': pa.int32(),
+    'rating': pa.float32(),
+    'Zip-code': pa.dictionary(pa.int32(), pa.string()),
+}
+
+
+def fact_schema(schema):
+    # The one schema of all parts: FACT_TYPES for those columns, the given schema's types for the rest
+    return pa.schema([pa.field(f.name, FACT_TYPES.get(f.name, f.type)) for f in schema], metadata=schema.metadata)
+
+
+def compact_fact(fact):
+    # Small dtypes in memory; the Parquet types come from fact_schema
+    fact['movie_id'] = fact['movie_id'].astype('int32')
+    fact['rating'] = fact['rating'].astype('float32')
+    if 'user_id' in fact.columns:
+        fact['user_id'] = fact['user_id'].astype('int32')
+    if 'Zip-code' in fact.columns:
+        fact['Zip-code'] = normalize_zip(fact['Zip-code']).astype('category')
+    return fact
+
+
+def run_streaming(input_file=INPUT_FILE, output_file=OUTPUT_FILE, chunksize=1_000_000, output_format='csv'):
+    """
+    Out-of-core version: memory is bounded by one chunk + one small state per movie.
+    Pass 1 accumulates (count, mean, M2) per movie, pass 2 writes the rows with the stats attached.
+
+    output_format='star' writes a ratings fact table (RATINGS_FACT_DIR, one Parquet part per chunk)
+    and a movies dimension (MOVIES_DIM) instead of broadcasting the movie fields onto every row.
+    """
+    print(f"Pass 1/2: accumulating rating statistics in chunks of {chunksize:,} rows...")
+    acc = None
+    for chunk in pd.read_csv(input_file, usecols=MOVIE_KEYS + ['rating'], chunksize=chunksize, low_memory=False):
+        chunk['Release_Year'] = pd.to_numeric(chunk['Release_Year'], errors='coerce')
+        acc = combine_partials(acc, partial_stats(chunk, MOVIE_KEYS))
+    movie_stats = finalize_stats(acc)
+
+    if output_format == 'star':
+        return write_star(input_file, movie_stats, chunksize)
+
+    print("Pass 2/2: attaching stats, ROI and Decade...")
+    first = True
+    n_rows = 0
+    for chunk in pd.read_csv(input_file, chunksize=chunksize, low_memory=False):
+        stats = movie_stats.reindex(movie_key_index(chunk))
+        for col in movie_stats.columns:
+            chunk[col] = stats[col].to_numpy()
+        chunk = add_roi_and_decade(chunk)
+
+        chunk.to_csv(output_file, mode='w' if first else 'a', header=first, index=False)
+        first = False
+        n_rows += len(chunk)
+    return n_rows
+
+
+
+def write_star(input_file, movie_stats, chunksize):
+    print("Pass 2/2: writing ratings fact table + movies dimension...")
+    os.makedirs(RATINGS_FACT_DIR, exist_ok=True)
+    for old_part in glob.glob(os.path.join(RATINGS_FACT_DIR, '*.parquet')):
+        os.remove(old_part)
+
+    schema = None
+    dim = None
+    n_rows = 0
+    for part, chunk in enumerate(pd.read_csv(input_file, chunksize=chunksize, low_memory=False)):
+        # movie_id = row of the movie in movie_stats (-1 when Title/Release_Year is missing)
+        movie_id = movie_stats.index.get_indexer(movie_key_index(chunk)).astype('int32')
+        movie_cols = [c for c in MOVIE_COLUMNS if c in chunk.columns]
+
+        # First row seen per movie carries its metadata; stays one row per movie across chunks
+        dim_rows = chunk.loc[movie_id >= 0, movie_cols].assign(movie_id=movie_id[movie_id >= 0])
+        dim = pd.concat([dim, dim_rows]) if dim is not None else dim_rows
+        dim = dim.drop_duplicates('movie_id')
+
+        fact = chunk.drop(columns=movie_cols)
+        fact.insert(0, 'movie_id', movie_id)
+        table = pa.Table.from_pandas(compact_fact(fact), preserve_index=False)
+        if schema is None:
+            schema = fact_schema(table.schema)
+        pq.write_table(table.cast(schema), os.path.join(RATINGS_FACT_DIR, f'part-{part:05d}.parquet'),
+                       row_group_size=ROW_GROUP_ROWS)
+        n_rows += len(chunk)
+
+    dim = dim.sort_values('movie_id').reset_index(drop=True)
+    stats = movie_stats.iloc[dim['movie_id'].to_numpy()]
+    for col in stats.columns:
+        dim[col] = stats[col].to_numpy()
+    dim = add_roi_and_decade(dim)
+    dim.to_parquet(MOVIES_DIM, index=False)
+
+    print(f"Saved {n_rows:,} ratings to {RATINGS_FACT_DIR}/ and {len(dim):,} movies to {MOVIES_DIM}")
+    return n_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add Rating_Count, Avg_Rating, Controversy_Score, ROI and Decade.")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="stream the input in chunks of this many rows (bounded memory)")
+    parser.add_argument("--format", choices=["star", "csv"], default="star",
+                        help="star: ratings fact table + movies dimension (default; the dashboard reads it "
+                             "with RATINGS_SOURCE=star); csv: one denormalized CSV")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="print per-column memory before/after dtype compaction (in-memory csv mode)")
+    args = parser.parse_args()
+
+    if args.format == "star":
+        run_streaming(chunksize=args.chunksize or 1_000_000, output_format="star")
+        print("-" * 30)
+        print(f"Process complete. Saved to: {RATINGS_FACT_DIR}/ + {MOVIES_DIM}")
+        print("\nSample movies (first 5 rows):")
+        df = pd.read_parquet(MOVIES_DIM).head(5)
+        print(df[['movie_id', 'Title', 'Rating_Count', 'Avg_Rating', 'Controversy_Score', 'ROI', 'Decade']].to_string())
+    else:
+        if args.chunksize:
+            run_streaming(chunksize=args.chunksize)
+            df = pd.read_csv(OUTPUT_FILE, nrows=5, low_memory=False)
+        else:
+            df = run_in_memory(memory_report=args.memory_report)
 
-# 1. Load the enriched dataset
-print("Loading data...")
-df = pd.read_csv('final_movies_dataset_enriched_full.csv', low_memory=False)
-
-# --- Step A: Calculate Rating Statistics (Per Movie) ---
-print("Calculating rating statistics (Count, Mean, Std)...")
-
-# We group by Title and Release_Year to ensure we treat each movie individually
-# 'rating' is the column we are analyzing
-movie_stats = df.groupby(['Title', 'Release_Year'])['rating'].agg(
-    Rating_Count='count',      # Popularity
-    Avg_Rating='mean',         # Quality
-    Controversy_Score='std'    # Controversy (Standard Deviation)
-).reset_index()
-
-# Handle cases where std is NaN (movies with only 1 rating have no deviation)
-movie_stats['Controversy_Score'] = movie_stats['Controversy_Score'].fillna(0)
-
-# Merge these new stats back into the main dataframe
-# This adds the 3 new columns to every row based on the movie
-df = pd.merge(df, movie_stats, on=['Title', 'Release_Year'], how='left')
-
-# --- Step B: Calculate ROI (Financial Success) ---
-print("Calculating ROI...")
-
-# Ensure budget and revenue are numeric
-df['budget'] = pd.to_numeric(df['budget'], errors='coerce')
-df['revenue'] = pd.to_numeric(df['revenue'], errors='coerce')
-
-# Calculate ROI: (Revenue - Budget) / Budget
-# We use np.where to avoid DivisionByZero errors if budget is 0 or NaN
-# Logic: If budget > 1000 (filtering out tiny/error budgets) AND revenue exists -> Calculate. Else -> NaN.
-valid_budget = (df['budget'] > 1000) & (df['revenue'].notna())
-
-df['ROI'] = np.where(
-    valid_budget,
-    (df['revenue'] - df['budget']) / df['budget'],
-    np.nan
-)
-
-# --- Step C: Create 'Decade' column (Bonus for visualizations) ---
-# This is very useful for the visualizations we discussed (Ridgeline plots etc.)
-df['Decade'] = (df['Release_Year'] // 10) * 10
-
-# --- Save Final File ---
-output_filename = 'final_project_data_ready.csv'
-df.to_csv(output_filename, index=False)
-
-print("-" * 30)
-print(f"Process complete. Saved to: {output_filename}")
-print("New columns added: 'Rating_Count', 'Avg_Rating', 'Controversy_Score', 'ROI', 'Decade'")
-print("\nSample Data (First 5 rows with new columns):")
-print(df[['Title', 'rating', 'Avg_Rating', 'Controversy_Score', 'ROI']].head(5).to_string())
\ No newline at end of file
+        print("-" * 30)
+        print(f"Process complete. Saved to: {OUTPUT_FILE}")
+        print("New columns added: 'Rating_Count', 'Avg_Rating', 'Controversy_Score', 'ROI', 'Decade'")
+        print("\nSample Data (First 5 rows with new columns):")
+        print(df[['Title', 'rating', 'Avg_Rating', 'Controversy_Score', 'ROI']].head(5).to_string())
@@ -0,0 +1,203 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from datastore import (MOVIES_DIM, RATINGS_CSV, RATINGS_FACT_DIR, RATINGS_PARQUET, ratings_source, read_ratings,
+                       read_ratings_sample)
+from incremental_ingest import VERSION_FILE, load_dashboard_accumulators
+from running_stats import finalize_stats
+from zip_lookup import ZIP_LOOKUP_PATH, attach_geo, load_zip_arrays
+
+# ============================================================
+#  Goal:
+#  Compute the state / ZIP aggregates once per dataset version and keep them
+#  on disk, keyed by a fingerprint of the input files. Dashboard reruns only
+#  slice these small tables instead of re-grouping every rating row.
+# ============================================================
+
+AGG_CACHE_DIR = ".agg_cache"
+AGG_CACHE_VERSION = 2  # part of the cache key: bump whenever the columns of state_stats / zip_stats change
+DATASET_FILES = [VERSION_FILE, RATINGS_FACT_DIR, MOVIES_DIM, RATINGS_PARQUET, RATINGS_CSV, ZIP_LOOKUP_PATH]
+PREVIEW_FRACTION = 0.02        # share of the rating rows the fast preview reads
+PREVIEW_MIN_GROUPS = 8         # ...at least this many row groups, so one or two stretches of the file don't decide the map
+
+
+def calculate_weighted_rating(df, m=None):
+    """
+    IMDb-style weighted rating:
+    WR = (v/(v+m))*R + (m/(v+m))*C
+    """
+    v = df["Rating_Count"]
+    R = df["Avg_Rating"]
+    C = df["Avg_Rating"].mean()
+    if m is None:
+        m = v.quantile(0.50)  # median
+    df["Weighted_Score"] = (v / (v + m) * R) + (m / (v + m) * C)
+    df["_C_global"] = C
+    df["_m_used"] = m
+    return df
+
+
+def load_dashboard_ratings(columns=("Zip-code", "rating")):
+    # Prebuilt ZIP lookup (python zip_lookup.py build / the pipeline), loaded first: a missing one fails
+    # right away with how to build it - no pgeocode query while serving
+    arrays = load_zip_arrays()
+
+    # Columnar file (memory-mapped) when available, CSV otherwise; ZIPs come back normalized + categorical
+    ratings = read_ratings(columns)
+
+    # Array lookup by integer ZIP (rows with unknown ZIPs are dropped, like the old inner merge)
+    return attach_geo(ratings, arrays)
+
+
+def load_dashboard_sample(frac=PREVIEW_FRACTION, min_groups=PREVIEW_MIN_GROUPS):
+    # The fast preview's ratings, sampled while reading (see read_ratings_sample), and their sampling rate
+    arrays = load_zip_arrays()
+    ratings, rate = read_ratings_sample(["Zip-code", "rating"], frac, min_groups)
+    return attach_geo(ratings, arrays), rate
+
+
+def dataset_fingerprint(paths=DATASET_FILES):
+    # Cheap fingerprint: name + size + mtime of every input file that exists (directories: every file inside)
+    h = hashlib.sha1()
+    h.update(f"source={ratings_source()};".encode())  # same files, other source -> other aggregates
+    for path in paths:
+        files = [path]
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, name) for name in os.listdir(path))
+        for file in files:
+            if os.path.isfile(file):
+                st = os.stat(file)
+                h.update(f"{file}|{st.st_size}|{st.st_mtime_ns};".encode())
+    return h.hexdigest()[:16]
+
+
+def format_delta(delta):
+    # Vectorized replacement for .map(lambda x: f"{x:+.3f}")
+    return np.char.mod("%+.3f", delta.to_numpy(dtype=float))
+
+
+def compute_aggregates(data):
+    state_stats = data.groupby(["State_Code", "State"], observed=True).agg(
+        Avg_Rating=("rating", "mean"),
+        Rating_Count=("rating", "count"),
+        Controversy_Score=("rating", "std")
+    ).reset_index()
+
+    state_stats = state_stats.dropna(subset=["State_Code"])
+    state_stats["Controversy_Score"] = state_stats["Controversy_Score"].fillna(0)
+    state_stats = calculate_weighted_rating(state_stats)
+
+    zip_stats = data.groupby(["State_Code", "Zip-code"], observed=True).agg(
+        Avg_Rating=("rating", "mean"),
+        Rating_Count=("rating", "count"),
+        Controversy_Score=("rating", "std")
+    ).reset_index()
+
+    zip_stats["Controversy_Score"] = zip_stats["Controversy_Score"].fillna(0)
+    zip_stats = calculate_weighted_rating(zip_stats)
+    zip_stats["Zip-code"] = zip_stats["Zip-code"].astype(str).str.zfill(5)
+
+    return add_delta(state_stats, zip_stats)
+
+
+def aggregates_from_accumulators(state_acc, zip_acc):
+    # Same tables as compute_aggregates, from (count, mean, M2) accumulators (incremental_ingest.py, sums below)
+    tables = []
+    for acc in (state_acc, zip_acc):
+        stats = finalize_stats(acc).reset_index()
+        tables.append(calculate_weighted_rating(stats))
+    state_stats, zip_stats = tables
+    zip_stats["Zip-code"] = zip_stats["Zip-code"].astype(str).str.zfill(5)
+    return add_delta(state_stats, zip_stats)
+
+
+def aggregates_from_sums(sums):
+    """
+    Aggregates from per-ZIP (or finer) additive cells: State_Code, State, Zip-code, count, sum, sumsq.
+    Every metric (mean, std for Controversy_Score, Weighted_Score, Delta) is exact from these three sums.
+    """
+    sums = sums[sums["count"] > 0]
+    if sums.empty:
+        return None, None
+
+    accumulators = []
+    for keys in (["State_Code", "State"], ["State_Code", "Zip-code"]):
+        acc = sums.groupby(keys, observed=True, sort=False)[["count", "sum", "sumsq"]].sum()
+        acc["mean"] = acc["sum"] / acc["count"]
+        acc["M2"] = (acc["sumsq"] - acc["sum"] * acc["mean"]).clip(lower=0)
+        accumulators.append(acc[["count", "mean", "M2"]])
+    return aggregates_from_accumulators(*accumulators)
+
+
+def preview_aggregates(sample, rate):
+    """
+    Approximate aggregates from a sample of the ratings read at the given rate (load_dashboard_sample).
+    Counts are scaled up by 1/rate. CI95 is the half-width of the 95% confidence interval of Avg_Rating;
+    row groups are whole stretches of the file, so it treats them as a random sample of rows.
+    """
+    tables = []
+    for keys in (["State_Code", "State"], ["State_Code", "Zip-code"]):
+        stats = sample.groupby(keys, observed=True).agg(
+            Avg_Rating=("rating", "mean"),
+            Sample_Count=("rating", "count"),
+            Controversy_Score=("rating", "std")
+        ).reset_index()
+        stats["Controversy_Score"] = stats["Controversy_Score"].fillna(0)
+        stats["Rating_Count"] = np.rint(stats["Sample_Count"] / rate).astype("int64")
+        # Standard error of the mean with the finite population correction (rate 1 -> exact, CI 0)
+        se = stats["Controversy_Score"] / np.sqrt(stats["Sample_Count"]) * np.sqrt(1 - rate)
+        stats["CI95"] = 1.96 * se
+        tables.append(calculate_weighted_rating(stats.drop(columns="Sample_Count")))
+
+    state_stats, zip_stats = tables
+    zip_stats["Zip-code"] = zip_stats["Zip-code"].astype(str).str.zfill(5)
+    return add_delta(state_stats, zip_stats)
+
+
+def add_delta(state_stats, zip_stats):
+    # Global mean (for Δ)
+    C_global = float(state_stats["Avg_Rating"].mean())
+    state_stats["Delta"] = state_stats["Avg_Rating"] - C_global
+    zip_stats["Delta"] = zip_stats["Avg_Rating"] - C_global
+
+    state_stats["Delta_fmt"] = format_delta(state_stats["Delta"])
+    zip_stats["Delta_fmt"] = format_delta(zip_stats["Delta"])
+    return state_stats, zip_stats
+
+
+def load_aggregates(fingerprint, load_data):
+    """
+    Return (state_stats, zip_stats) for this dataset fingerprint.
+    Reads them from the on-disk cache when present; with the "star" ratings source, then from the
+    rollup cube, then from the incremental-ingest accumulators (both are built from the fact table);
+    otherwise calls load_data(), aggregates and saves.
+    """
+    # Cache format version in the key: tables written by an older version (other columns) are never reused
+    state_path = os.path.join(AGG_CACHE_DIR, f"v{AGG_CACHE_VERSION}_{fingerprint}_state.parquet")
+    zip_path = os.path.join(AGG_CACHE_DIR, f"v{AGG_CACHE_VERSION}_{fingerprint}_zip.parquet")
+
+    if os.path.exists(state_path) and os.path.exists(zip_path):
+        return pd.read_parquet(state_path), pd.read_parquet(zip_path)
+
+    from rollup_cube import cube_aggregates, load_cube
+
+    star = ratings_source() == "star"
+    cube = load_cube() if star else None
+    accumulators = load_dashboard_accumulators() if star and cube is None else None
+    if cube is not None:
+        state_stats, zip_stats = cube_aggregates(cube)
+    elif accumulators is not None:
+        state_stats, zip_stats = aggregates_from_accumulators(*accumulators)
+    else:
+        data = load_data()
+        if data is None or data.empty:
+            return None, None
+        state_stats, zip_stats = compute_aggregates(data)
+
+    os.makedirs(AGG_CACHE_DIR, exist_ok=True)
+    state_stats.to_parquet(state_path, index=False)
+    zip_stats.to_parquet(zip_path, index=False)
+    return state_stats, zip_stats
@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource  # peak RSS (not available on Windows)
+except ImportError:
+    resource = None
+
+from streamlit.testing.v1 import AppTest
+
+from bench_pipeline import RESULTS_DIR, git_commit
+from synth_data import MANIFEST_FILE, generate
+from zcta_shards import ZCTA_GEOJSON, build_shards, has_shards
+from zip_lookup import ZIP_LOOKUP_PATH
+
+# ============================================================
+#  Benchmark: headless latency / concurrency harness for Vizu_1.py.
+#  Scripted sessions (AppTest, no browser) click through the dashboard like a viewer:
+#  national view -> switch metric -> click a state -> move the min-votes slider ->
+#  switch metric -> back to USA, and every rerun is timed.
+#  AppTest swaps a process-global mock Runtime in and out on every run, so two sessions
+#  can't run at the same time in one process. Concurrency therefore comes from worker
+#  processes: each one is a small "server" that runs its share of the sessions back to
+#  back with warm process-wide caches, while the others compete for the same CPUs and disk.
+#  Reports p50 / p95 / p99 rerun latency per step, figure payload bytes and worker memory.
+#
+#  Run:  python bench_dashboard.py --sessions 50 --concurrency 8 [--data synthetic_1000000] [--cold]
+# ============================================================
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Vizu_1.py")
+STATE_METRICS = ["Number of Ratings", "Above/Below Global Average (Δ)"]
+ZIP_METRICS = ["Number of Ratings", "Average Rating", "Weighted Rating (IMDb formula)",
+               "Above/Below Global Average (Δ)"]
+SLIDER_VALUES = [0, 5, 20, 50, 100]
+
+
+def current_rss_mb():
+    # Resident set size right now (Linux); None elsewhere
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        return None
+
+
+def payload_bytes(at):
+    # Size of the Plotly JSON the server would send for this rerun
+    return sum(len(chart.proto.spec) for chart in at.get("plotly_chart"))
+
+
+def timed_run(at, step, records):
+    t0 = time.perf_counter()
+    at.run()
+    seconds = time.perf_counter() - t0
+    if at.exception:
+        raise RuntimeError(f"{step}: {at.exception[0].value}")
+    records.append({"step": step, "seconds": seconds, "payload_bytes": payload_bytes(at)})
+
+
+def sidebar_widget(at, kind, label):
+    # Widgets by label, not position: adding a control to the sidebar mustn't retarget the script
+    for widget in getattr(at.sidebar, kind):
+        if widget.label == label:
+            return widget
+    raise RuntimeError(f"no sidebar {kind} labelled {label!r}")
+
+
+def run_session(seed, states):
+    rng = np.random.default_rng(seed)
+    records = []
+    at = AppTest.from_file(APP_FILE, default_timeout=300)
+
+    timed_run(at, "national_view", records)
+    sidebar_widget(at, "radio", "Metric (States):").set_value(str(rng.choice(STATE_METRICS)))
+    timed_run(at, "switch_metric_states", records)
+
+    # Plotly clicks can't be scripted headless: set what the click handler sets
+    at.session_state.selected_state = str(rng.choice(states))
+    timed_run(at, "click_state", records)
+    sidebar_widget(at, "slider", "Min ZIP votes (drilldown):").set_value(int(rng.choice(SLIDER_VALUES)))
+    timed_run(at, "min_votes_slider", records)
+    sidebar_widget(at, "radio", "Metric (ZIPs):").set_value(str(rng.choice(ZIP_METRICS)))
+    timed_run(at, "switch_metric_zips", records)
+
+    sidebar_widget(at, "button", "Back to USA").click()
+    timed_run(at, "back_to_usa", records)
+    return records
+
+
+def summarize(records):
+    df = pd.DataFrame(records)
+    rows = []
+    for step, group in [("all", df)] + list(df.groupby("step", sort=False)):
+        ms = group["seconds"].to_numpy() * 1000
+        rows.append({"step": step, "reruns": len(group),
+                     "p50_ms": round(float(np.percentile(ms, 50)), 1),
+                     "p95_ms": round(float(np.percentile(ms, 95)), 1),
+                     "p99_ms": round(float(np.percentile(ms, 99)), 1),
+                     "mean_payload_kb": round(float(group["payload_bytes"].mean()) / 1e3, 1)})
+    return rows
+
+
+def run_worker(data_dir, seeds, states):
+    """One worker process: its sessions back to back. Returns (records, RSS after each session, peak RSS)."""
+    os.chdir(data_dir)
+    records, rss = [], []
+    for seed in seeds:
+        records += run_session(seed, states)
+        rss.append(current_rss_mb())
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None
+    return records, rss, peak_mb
+
+
+def run_harness(data_dir, sessions, concurrency, cold=False, seed=0):
+    os.chdir(data_dir)
+    if not has_shards() and os.path.exists(ZCTA_GEOJSON):
+        build_shards()
+    if cold:
+        import shutil
+        from aggregates import AGG_CACHE_DIR
+        shutil.rmtree(AGG_CACHE_DIR, ignore_errors=True)
+    states = sorted(pd.read_parquet(ZIP_LOOKUP_PATH, columns=["State_Code"])["State_Code"].astype(str).unique())
+
+    seeds = list(range(seed, seed + sessions))
+    t0 = time.perf_counter()
+    records, workers = [], []
+    with ProcessPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_worker, os.path.abspath("."), seeds[i::concurrency], states)
+                   for i in range(concurrency) if seeds[i::concurrency]]
+        for future in futures:
+            worker_records, rss, peak_mb = future.result()
+            records += worker_records
+            workers.append({"sessions": len(rss), "rss_first_session_mb": rss[0], "rss_last_session_mb": rss[-1],
+                            "peak_rss_mb": peak_mb})
+    wall = time.perf_counter() - t0
+
+    steps = summarize(records)
+    first = [w["rss_first_session_mb"] for w in workers if w["rss_first_session_mb"] is not None]
+    last = [w["rss_last_session_mb"] for w in workers if w["rss_last_session_mb"] is not None]
+    return {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "git_commit": git_commit(),
+        "data_dir": os.path.abspath("."),
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "cold_start": cold,
+        "wall_seconds": round(wall, 2),
+        "reruns_per_s": round(len(records) / wall, 1),
+        # Per worker: RSS after its first and its last session (growth = per-session cost), and the peak
+        "worker_rss_first_mb": round(max(first), 1) if first else None,
+        "worker_rss_last_mb": round(max(last), 1) if last else None,
+        "worker_peak_rss_mb": max((w["peak_rss_mb"] or 0 for w in workers), default=None),
+        "total_peak_rss_mb": round(sum(w["peak_rss_mb"] or 0 for w in workers), 1),
+        "workers": workers,
+        "steps": steps,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless rerun latency / concurrency harness for Vizu_1.py.")
+    parser.add_argument("--data", default=None, help="dataset directory (default: synthetic_<rows>)")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="size to generate if --data is missing")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4, help="sessions running at the same time (worker processes)")
+    parser.add_argument("--cold", action="store_true", help="clear the on-disk aggregate cache first")
+    args = parser.parse_args()
+
+    data_dir = args.data or f"synthetic_{args.rows}"
+    if not os.path.isdir(data_dir):
+        generate(data_dir, args.rows)
+    start_dir = os.getcwd()
+
+    report = run_harness(data_dir, args.sessions, args.concurrency, cold=args.cold)
+    print(f"{report['sessions']} sessions x {len(report['steps']) - 1} steps, concurrency {report['concurrency']}: "
+          f"{report['wall_seconds']}s, {report['reruns_per_s']} reruns/s, "
+          f"worker RSS {report['worker_rss_first_mb']} -> {report['worker_rss_last_mb']} MB, "
+          f"peak {report['worker_peak_rss_mb']:.0f} MB per worker / {report['total_peak_rss_mb']:.0f} MB total")
+    print(f"{'step':<22} {'reruns':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'payload KB':>11}")
+    for s in report["steps"]:
+        print(f"{s['step']:<22} {s['reruns']:>7} {s['p50_ms']:>8} {s['p95_ms']:>8} {s['p99_ms']:>8} "
+              f"{s['mean_payload_kb']:>11}")
+
+    os.chdir(start_dir)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    manifest_path = os.path.join(data_dir, MANIFEST_FILE)
+    rows = "real"
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            rows = json.load(f)["rows"]
+    out_path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{report['git_commit']}_{rows}_dashboard.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results -> {out_path}")
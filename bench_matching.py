@@ -0,0 +1,185 @@
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_merging import (MAIN_FILE, META_COLUMNS, META_FILE, match_closest_year, normalize_titles,
+                          prepare_meta, prepare_unique_movies)
+from fuzzy_matching import fuzzy_match, sequel_markers
+
+# ============================================================
+#  Benchmark: old row-by-row matching (per-title .apply + candidate explosion + sort)
+#  vs the vectorized normalize_titles + as-of match_closest_year, on the real movie lists.
+#  Then the precision of the fuzzy fallback (how many of its matches are the right film):
+#  on hand-written franchise / typo probes, and on a holdout of the metadata itself.
+#
+#  Run:  python bench_matching.py [final_movies_dataset.csv] [movies_metadata.csv]
+# ============================================================
+
+# Metadata catalog for the probes; the queries' own films are deliberately missing from it
+PROBE_CATALOG = [("Toy Story", 1995), ("Toy Story 2", 1999), ("Lethal Weapon", 1987), ("Lethal Weapon 3", 1992),
+                 ("Friday the 13th Part 2", 1981), ("Die Hard", 1988), ("Die Hard: With a Vengeance", 1995),
+                 ("Home Alone", 1990), ("Home Alone 2: Lost in New York", 1992), ("Star Trek: First Contact", 1996),
+                 ("The Lion King", 1994), ("Alien", 1979), ("The Matrix", 1999), ("Seven Samurai", 1954),
+                 ("Dr. Strangelove", 1964)]
+# (title, year, the catalog title it should match or None)
+PROBES = [("Toy Story 4", 2019, None), ("Lethal Weapon 4", 1998, None), ("Friday the 13th Part 3", 1982, None),
+          ("Die Hard 2", 1990, None), ("Home Alone 3", 1997, None), ("Star Trek: Insurrection", 1998, None),
+          ("The Lion King 2: Simba's Pride", 1998, None), ("Alien: Resurrection", 1997, None),
+          ("Tha Matrix", 1999, "The Matrix"), ("The Seven Samurai", 1954, "Seven Samurai"),
+          ("Lethal Wepon 3", 1992, "Lethal Weapon 3"), ("Toy Story II", 1999, "Toy Story 2"),
+          ("Dr. Strangelove or: How I Learned to Stop Worrying and Love the Bomb", 1964, "Dr. Strangelove")]
+
+
+# --- The original implementation, kept here only as the baseline ---
+def get_clean_join_key(text):
+    if not isinstance(text, str):
+        return ""
+    text = text.replace('&', 'and')
+    text = re.sub(r'\([^)]*\)', '', text)
+    text = text.lower()
+    text = re.sub(r'[^a-z0-9\s]', '', text)
+    words = text.split()
+    words.sort()
+    return " ".join(words)
+
+
+def calculate_diff(row):
+    if pd.isna(row['year_meta']) or pd.isna(row['revenue']):
+        return 9999
+    return abs(row['year_main'] - row['year_meta'])
+
+
+def legacy_match(main_df, meta_df):
+    unique_movies = main_df[['Title', 'Release_Year']].drop_duplicates().copy()
+    unique_movies['join_key'] = unique_movies['Title'].apply(get_clean_join_key)
+    unique_movies['year_main'] = pd.to_numeric(unique_movies['Release_Year'], errors='coerce').fillna(0).astype(int)
+
+    meta_df = meta_df.copy()
+    meta_df['release_date'] = pd.to_datetime(meta_df['release_date'], errors='coerce')
+    meta_df['year_meta'] = meta_df['release_date'].dt.year.fillna(0).astype(int)
+    meta_df['join_key'] = meta_df['title'].apply(get_clean_join_key)
+    meta_subset = meta_df[META_COLUMNS].drop_duplicates(subset=['join_key', 'year_meta'])
+
+    candidates = pd.merge(unique_movies, meta_subset, on='join_key', how='left')
+    candidates['year_diff'] = candidates.apply(calculate_diff, axis=1)
+    candidates.sort_values(by=['Title', 'Release_Year', 'year_diff'], ascending=[True, True, True], inplace=True)
+    return candidates.drop_duplicates(subset=['Title', 'Release_Year'], keep='first')
+
+
+def vectorized_match(main_df, meta_df):
+    return match_closest_year(prepare_unique_movies(main_df), prepare_meta(meta_df.copy()))
+
+
+def alt_keys(titles):
+    # Same second key fill_unmatched uses: the title without its subtitle
+    return normalize_titles(pd.Series(titles).astype(str).str.split(r':| - ', n=1, regex=True).str[0])
+
+
+def precision(matched, correct, expected):
+    # -> (matches made, right ones, precision, recall over the queries that have a right answer)
+    return matched, correct, correct / matched if matched else float('nan'), correct / expected if expected else float('nan')
+
+
+def probe_precision():
+    titles, years = [p[0] for p in PROBES], [p[1] for p in PROBES]
+    cat_titles = [c[0] for c in PROBE_CATALOG]
+    positions, _ = fuzzy_match(normalize_titles(titles), years, normalize_titles(cat_titles),
+                               [c[1] for c in PROBE_CATALOG], alt_keys=alt_keys(titles), workers=1)
+    correct = 0
+    for (title, _, expected), pos in zip(PROBES, positions):
+        got = cat_titles[pos] if pos >= 0 else None
+        correct += got is not None and got == expected
+        print(f"  {'ok ' if got == expected else 'BAD'} {title!r:<45} -> {got!r}")
+    return precision(int((positions >= 0).sum()), correct, sum(p[2] is not None for p in PROBES))
+
+
+def add_typo(key, rng):
+    # One substituted letter in a random word of 4+ letters (numbers untouched); None if there is none
+    words = key.split()
+    options = [i for i, w in enumerate(words) if len(w) >= 4 and not sequel_markers([w])]
+    if not options:
+        return None
+    i = options[rng.integers(len(options))]
+    j = int(rng.integers(len(words[i])))
+    words[i] = words[i][:j] + ("x" if words[i][j] != "x" else "z") + words[i][j + 1:]
+    return " ".join(sorted(words))
+
+
+def holdout_precision(meta_subset, n=500, seed=0):
+    """
+    Fuzzy matching on the metadata against itself.
+    Typo queries: a metadata title with one typo -> must find that row.
+    Absent queries: titles whose join_key was removed from the catalog -> any match is a wrong film.
+    """
+    rng = np.random.default_rng(seed)
+    meta = meta_subset[meta_subset['join_key'] != ''].reset_index(drop=True)
+    picks = rng.choice(len(meta), size=min(2 * n, len(meta)), replace=False)
+    absent_rows, typo_rows = picks[:len(picks) // 2], picks[len(picks) // 2:]
+    absent_keys = set(meta['join_key'].iloc[absent_rows])
+    catalog = meta[~meta['join_key'].isin(absent_keys)].reset_index(drop=True)
+
+    typo = [(add_typo(k, rng), y, k) for k, y in zip(meta['join_key'].iloc[typo_rows], meta['year_meta'].iloc[typo_rows])
+            if k not in absent_keys]
+    typo = [t for t in typo if t[0] is not None]
+    absent = list(zip(meta['join_key'].iloc[absent_rows], meta['year_meta'].iloc[absent_rows]))
+    keys = [t[0] for t in typo] + [a[0] for a in absent]
+    years = [t[1] for t in typo] + [a[1] for a in absent]
+
+    positions, _ = fuzzy_match(keys, years, catalog['join_key'], catalog['year_meta'])
+    found = catalog['join_key'].to_numpy()[np.maximum(positions, 0)]
+    correct = sum(1 for (_, _, truth), pos, key in zip(typo, positions, found) if pos >= 0 and key == truth)
+    wrong_absent = int((positions[len(typo):] >= 0).sum())
+    print(f"  typo queries: {len(typo)}, absent queries: {len(absent)} (matched to another film: {wrong_absent})")
+    return precision(int((positions >= 0).sum()), correct, len(typo))
+
+
+def timed(fn, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+if __name__ == "__main__":
+    main_file = sys.argv[1] if len(sys.argv) > 1 else MAIN_FILE
+    meta_file = sys.argv[2] if len(sys.argv) > 2 else META_FILE
+
+    print("Loading data...")
+    main_df = pd.read_csv(main_file, low_memory=False)
+    main_df.columns = main_df.columns.str.strip()
+    meta_df = pd.read_csv(meta_file, low_memory=False)
+    titles = pd.concat([main_df['Title'].drop_duplicates(), meta_df['title']], ignore_index=True)
+
+    t_key_old, keys_old = timed(lambda: titles.apply(get_clean_join_key))
+    t_key_new, keys_new = timed(normalize_titles, titles)
+    t_old, old = timed(legacy_match, main_df, meta_df, repeat=1)
+    t_new, new = timed(vectorized_match, main_df, meta_df)
+
+    # Same movie -> equally good match? (compare year_diff, since ties may pick a different row)
+    cmp = old.merge(new, on=['Title', 'Release_Year'], suffixes=('_old', '_new'))
+    diff_new = cmp[['year_main_new', 'year_meta_new', 'revenue_new']].set_axis(
+        ['year_main', 'year_meta', 'revenue'], axis=1).apply(calculate_diff, axis=1)
+    same_key = (keys_old.to_numpy() == keys_new).mean()
+    same_diff = (cmp['year_diff'] == diff_new).mean()
+
+    print("-" * 30)
+    print(f"Titles normalized: {len(titles):,}   Unique movies: {len(new):,}   Metadata rows: {len(meta_df):,}")
+    print(f"{'step':<22} {'old (s)':>10} {'new (s)':>10} {'speedup':>9}")
+    print(f"{'title normalization':<22} {t_key_old:>10.3f} {t_key_new:>10.3f} {t_key_old / t_key_new:>8.1f}x")
+    print(f"{'full matching':<22} {t_old:>10.3f} {t_new:>10.3f} {t_old / t_new:>8.1f}x")
+    print(f"Identical join keys: {same_key:.2%}   Equally close match: {same_diff:.2%}")
+
+    print("-" * 30)
+    print("Fuzzy fallback precision")
+    print("Probes:")
+    probes = probe_precision()
+    print("Metadata holdout:")
+    holdout = holdout_precision(prepare_meta(meta_df.copy()))
+    print(f"{'set':<10} {'matched':>8} {'right':>7} {'precision':>10} {'recall':>8}")
+    for name, (matched, correct, prec, rec) in [("probes", probes), ("holdout", holdout)]:
+        print(f"{name:<10} {matched:>8} {correct:>7} {prec:>10.1%} {rec:>8.1%}")
@@ -0,0 +1,200 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+try:
+    import resource  # peak RSS per stage (not available on Windows)
+except ImportError:
+    resource = None
+
+from synth_data import MANIFEST_FILE, generate
+
+# ============================================================
+#  Benchmark suite: times each pipeline stage on a (synthetic) dataset directory and
+#  records wall time, throughput and peak RSS to a JSON file, so runs can be compared.
+#  Every stage runs in a fresh process (its peak RSS is its own); setup work a stage
+#  needs (reading its input) is not in its timing unless the stage *is* the read.
+#
+#  Run:      python bench_pipeline.py --rows 1000000            (generates synthetic_1000000/ if missing)
+#            python bench_pipeline.py --data synthetic_10M --compare bench_results/<older>.json
+# ============================================================
+
+RESULTS_DIR = "bench_results"
+
+
+def stage_load():
+    from data_merging import MAIN_FILE
+    from datastore import read_csv_compact
+
+    t0 = time.perf_counter()
+    df = read_csv_compact(MAIN_FILE)
+    return len(df), time.perf_counter() - t0
+
+
+def stage_title_normalization():
+    from data_merging import MAIN_FILE, META_FILE, normalize_titles
+
+    titles = pd.concat([pd.read_csv(MAIN_FILE, usecols=["Title"])["Title"].drop_duplicates(),
+                        pd.read_csv(META_FILE, usecols=["title"])["title"]], ignore_index=True)
+    t0 = time.perf_counter()
+    normalize_titles(titles)
+    return len(titles), time.perf_counter() - t0
+
+
+def stage_matching():
+    from data_merging import MAIN_FILE, META_FILE, match_closest_year, prepare_meta, prepare_unique_movies
+
+    main_df = pd.read_csv(MAIN_FILE, usecols=["Title", "Release_Year"], low_memory=False)
+    meta_df = pd.read_csv(META_FILE, low_memory=False)
+    t0 = time.perf_counter()
+    best = match_closest_year(prepare_unique_movies(main_df), prepare_meta(meta_df))
+    return len(best), time.perf_counter() - t0
+
+
+def stage_merge():
+    # data_merging.py end to end; writes the enriched CSV the later stages read
+    import data_merging
+
+    t0 = time.perf_counter()
+    rows = data_merging.run()
+    return rows, time.perf_counter() - t0
+
+
+def stage_groupby():
+    from adding_features import INPUT_FILE, MOVIE_KEYS
+    from datastore import read_csv_compact
+
+    df = read_csv_compact(INPUT_FILE, usecols=MOVIE_KEYS + ["rating"])
+    t0 = time.perf_counter()
+    df.groupby(MOVIE_KEYS, observed=True)["rating"].agg(["count", "mean", "std"])
+    return len(df), time.perf_counter() - t0
+
+
+def stage_roi():
+    from adding_features import INPUT_FILE, add_roi_and_decade
+    from datastore import read_csv_compact
+
+    df = read_csv_compact(INPUT_FILE, usecols=["Release_Year", "budget", "revenue"])
+    t0 = time.perf_counter()
+    add_roi_and_decade(df)
+    return len(df), time.perf_counter() - t0
+
+
+def stage_write():
+    # adding_features.py end to end in its default star-schema form (stats pass + fact/dimension write)
+    from adding_features import run_streaming
+
+    t0 = time.perf_counter()
+    rows = run_streaming(output_format="star")
+    return rows, time.perf_counter() - t0
+
+
+def stage_dashboard_load():
+    # What a cold dashboard does when no aggregate cache exists: load ratings + aggregate
+    from aggregates import compute_aggregates, load_dashboard_ratings
+
+    t0 = time.perf_counter()
+    data = load_dashboard_ratings()
+    compute_aggregates(data)
+    return len(data), time.perf_counter() - t0
+
+
+STAGES = {
+    "load": stage_load,
+    "title_normalization": stage_title_normalization,
+    "matching": stage_matching,
+    "merge": stage_merge,
+    "groupby": stage_groupby,
+    "roi": stage_roi,
+    "write": stage_write,
+    "dashboard_load": stage_dashboard_load,
+}
+
+
+def run_stage(name, data_dir):
+    """Runs in a fresh worker process: returns (rows, seconds, peak RSS in MB or None)."""
+    os.chdir(data_dir)
+    rows, seconds = STAGES[name]()
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None
+    return rows, seconds, peak_mb
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_suite(data_dir, only=None):
+    manifest_path = os.path.join(data_dir, MANIFEST_FILE)
+    manifest = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    results = {}
+    for name in only or STAGES:
+        with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as pool:
+            rows, seconds, peak_mb = pool.submit(run_stage, name, os.path.abspath(data_dir)).result()
+        results[name] = {"rows": rows, "seconds": round(seconds, 4),
+                         "rows_per_s": round(rows / seconds) if seconds > 0 else None,
+                         "peak_rss_mb": None if peak_mb is None else round(peak_mb, 1)}
+        print(f"{name:<20} {seconds:>9.3f}s {results[name]['rows_per_s'] or 0:>14,} rows/s "
+              f"{'' if peak_mb is None else f'{peak_mb:.0f} MB':>9}")
+
+    return {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "git_commit": git_commit(),
+        "data_dir": os.path.abspath(data_dir),
+        "dataset": manifest,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "stages": results,
+    }
+
+
+def compare(current, baseline):
+    print("-" * 30)
+    print(f"vs {baseline['git_commit']} ({baseline['created']})")
+    print(f"{'stage':<20} {'old (s)':>9} {'new (s)':>9} {'speedup':>8} {'old MB':>8} {'new MB':>8}")
+    for name, new in current["stages"].items():
+        old = baseline["stages"].get(name)
+        if old is None:
+            continue
+        speedup = old["seconds"] / new["seconds"] if new["seconds"] else float("nan")
+        print(f"{name:<20} {old['seconds']:>9.3f} {new['seconds']:>9.3f} {speedup:>7.2f}x "
+              f"{old['peak_rss_mb'] or 0:>8.0f} {new['peak_rss_mb'] or 0:>8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time every pipeline stage and save the results as JSON.")
+    parser.add_argument("--data", default=None, help="dataset directory (default: synthetic_<rows>)")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="size to generate if --data is missing")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="+", choices=list(STAGES), help="run only these stages")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    data_dir = args.data or f"synthetic_{args.rows}"
+    if not os.path.isdir(data_dir):
+        generate(data_dir, args.rows, args.seed)
+
+    report = run_suite(data_dir, args.only)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    rows = (report["dataset"] or {}).get("rows", "real")
+    out_path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{report['git_commit']}_{rows}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results -> {out_path}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
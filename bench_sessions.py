@@ -0,0 +1,53 @@
+import os
+import pickle
+import sys
+import tracemalloc
+
+from streamlit.testing.v1 import AppTest
+
+from aggregates import dataset_fingerprint, load_aggregates, load_dashboard_ratings
+
+# ============================================================
+#  Benchmark: process memory vs number of concurrent dashboard sessions.
+#  Each session is a headless AppTest run of Vizu_1.py (national view + one drilldown)
+#  kept alive while the next one starts, all in this one process like a Streamlit server.
+#  Shared datasets (st.cache_resource) should make the per-session increment small;
+#  the "copy per session" column is what st.cache_data would have added per session.
+#
+#  Run:  python bench_sessions.py [max_sessions] [drilldown_state]
+# ============================================================
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Vizu_1.py")
+
+
+def run_session(state):
+    at = AppTest.from_file(APP_FILE, default_timeout=120)
+    at.run()
+    if state:
+        at.session_state.selected_state = state
+        at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return at
+
+
+if __name__ == "__main__":
+    max_sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    state = sys.argv[2] if len(sys.argv) > 2 else "CA"
+
+    copy_mb = len(pickle.dumps(load_aggregates(dataset_fingerprint(), load_dashboard_ratings))) / 1e6
+
+    tracemalloc.start()
+    sessions = []
+    base = None
+    print(f"{'sessions':>8} {'traced MB':>10} {'per session MB':>15} {'copy per session MB':>20}")
+    while len(sessions) < max_sessions:
+        sessions.append(run_session(state))
+        current = tracemalloc.get_traced_memory()[0] / 1e6
+        if base is None:
+            base = current  # first session pays for the shared datasets
+        n = len(sessions)
+        if n & (n - 1) == 0 or n == max_sessions:  # 1, 2, 4, 8, ...
+            per_session = (current - base) / (n - 1) if n > 1 else 0.0
+            print(f"{n:>8} {current:>10.1f} {per_session:>15.2f} {copy_mb:>20.2f}")
+    tracemalloc.stop()
@@ -1,12 +1,103 @@
+import json
+import os
+import sys
+
 import geopandas as gpd
+import numpy as np
+import shapely
+
+from geo_manifest import write_manifest
+from zcta_shards import SHARD_DIR, ZCTA_KEY, build_shards
 
 shp_path = r"C:\Users\97250\PycharmProjects\VISUALIZATION_PROJECT\cb_2018_us_zcta510_500k\cb_2018_us_zcta510_500k.shp"
 out_geojson = r"C:\Users\97250\PycharmProjects\VISUALIZATION_PROJECT\zcta.geojson"
 
-gdf = gpd.read_file(shp_path)
+# Simplification tolerance (degrees) + coordinate decimals per variant.
+# "full" is the original geometry; the dashboard picks the lightest one that suits the view.
+VARIANTS = {
+    "full": (None, 6),
+    "high": (0.0005, 5),
+    "medium": (0.002, 4),
+    "low": (0.01, 3),
+}
+VARIANTS_MANIFEST = "zcta_variants.json"
+
+
+def make_variant(gdf, tolerance, decimals):
+    geoms = gdf.geometry.values
+    if tolerance is not None:
+        geoms = shapely.simplify(geoms, tolerance, preserve_topology=True)
+    # Round coordinates -> much shorter numbers in the JSON payload
+    geoms = shapely.transform(geoms, lambda coords: np.round(coords, decimals))
+    return gpd.GeoDataFrame({ZCTA_KEY: gdf[ZCTA_KEY].values}, geometry=geoms, crs=gdf.crs)
+
+
+def write_topojson(variant_gdf, path):
+    # Optional shared-arc encoding (pip install topojson)
+    try:
+        import topojson as tp
+    except ImportError:
+        print("  topojson not installed, skipping TopoJSON output")
+        return None
+    topo = tp.Topology(variant_gdf, prequantize=False, toposimplify=False)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(topo.to_json())
+    return os.path.getsize(path)
+
+
+def convert(shp=shp_path, out=out_geojson, topojson=False):
+    gdf = gpd.read_file(shp)
+
+    # חשוב: Plotly עובד הכי טוב עם WGS84 (lat/lon)
+    gdf = gdf.to_crs(epsg=4326)
+
+    out_dir = os.path.dirname(out)
+    base = os.path.splitext(os.path.basename(out))[0]
+    report = {}
+    for name, (tolerance, decimals) in VARIANTS.items():
+        path = out if name == "full" else os.path.join(out_dir, f"{base}_{name}.geojson")
+        variant = make_variant(gdf, tolerance, decimals)
+
+        # Only the ZCTA property is kept
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(variant.to_json(drop_id=True))
+
+        # Manifest sidecar straight from the GeoDataFrame (nobody has to parse the GeoJSON to describe it)
+        write_manifest(path, {
+            "feature_key": ZCTA_KEY,
+            "property_keys": [ZCTA_KEY],
+            "example": {ZCTA_KEY: str(variant[ZCTA_KEY].iloc[0])},
+            "geometry_types": sorted(variant.geom_type.dropna().unique().tolist()),
+            "feature_count": len(variant),
+            "bbox": [round(float(v), decimals) for v in variant.total_bounds],
+        })
+
+        report[name] = {
+            "path": os.path.basename(path),
+            "tolerance": tolerance,
+            "decimals": decimals,
+            "bytes": os.path.getsize(path),
+            "vertices": int(shapely.get_num_coordinates(variant.geometry.values).sum()),
+        }
+        if topojson:
+            topo_bytes = write_topojson(variant, os.path.splitext(path)[0] + ".topojson")
+            if topo_bytes is not None:
+                report[name]["topojson_bytes"] = topo_bytes
+
+        # Per-state shards for the dashboard drilldown
+        build_shards(path, os.path.join(SHARD_DIR, name))
+
+    with open(os.path.join(out_dir, VARIANTS_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print("-" * 30)
+    print(f"{'variant':<8} {'tolerance':>10} {'MB':>9} {'vertices':>12}")
+    for name, info in report.items():
+        print(f"{name:<8} {str(info['tolerance']):>10} {info['bytes'] / 1e6:>9.2f} {info['vertices']:>12,}")
+    print("DONE. Saved:", out)
+    return report
 
-# חשוב: Plotly עובד הכי טוב עם WGS84 (lat/lon)
-gdf = gdf.to_crs(epsg=4326)
 
-gdf.to_file(out_geojson, driver="GeoJSON")
-print("DONE. Saved:", out_geojson)
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != "--topojson"]
+    convert(*args[:2], topojson="--topojson" in sys.argv)
@@ -1,102 +1,150 @@
+import sys
+
+import numpy as np
 import pandas as pd
-import re
+
+from fuzzy_matching import fill_unmatched
 
 # ============================================================
 #  Goal:
 #  Enrich the main movies dataset with metadata fields (revenue, budget, etc.)
 #  by matching movies between two CSV files using a cleaned "join_key" + closest year.
+#
+#  Run:      python data_merging.py [--fuzzy]
+#  Preview:  python data_merging.py preview
 # ============================================================
 
-# # --- Helper functions for cleaning/matching ---
-# def get_clean_join_key(text):
-#     # Create a normalized key from a movie title for robust matching
-#     if not isinstance(text, str):
-#         return ""
-#     text = text.replace('&', 'and')             # Replace '&' with 'and'
-#     text = re.sub(r'\([^)]*\)', '', text)       # Remove parentheses and their content
-#     text = text.lower()                         # Lowercase
-#     text = re.sub(r'[^a-z0-9\s]', '', text)     # Keep only letters, numbers, and spaces
-#     words = text.split()
-#     words.sort()                                # Sort words to reduce ordering issues
-#     return " ".join(words)
-#
-# def calculate_diff(row):
-#     # Compute absolute year difference to pick the closest match
-#     if pd.isna(row['year_meta']) or pd.isna(row['revenue']):
-#         return 9999
-#     return abs(row['year_main'] - row['year_meta'])
-#
-# # --- 1. Load data ---
-# print("Loading data...")
-# main_df = pd.read_csv('final_movies_dataset.csv', low_memory=False)
-# meta_df = pd.read_csv('movies_metadata.csv', low_memory=False)
-#
-# # Strip column name whitespace to avoid subtle merge/key issues
-# main_df.columns = main_df.columns.str.strip()
-#
-# # --- 2. Build unique movie list (avoid working on the full huge table first) ---
-# print("Creating unique movies list for matching...")
-# unique_movies = main_df[['Title', 'Release_Year']].drop_duplicates().copy()
-#
-# # Prepare join keys + numeric year in the main dataset
-# unique_movies['join_key'] = unique_movies['Title'].apply(get_clean_join_key)
-# unique_movies['year_main'] = pd.to_numeric(unique_movies['Release_Year'], errors='coerce').fillna(0).astype(int)
-#
-# # --- 3. Prepare metadata ---
-# print("Preparing metadata...")
-# meta_df['release_date'] = pd.to_datetime(meta_df['release_date'], errors='coerce')
-# meta_df['year_meta'] = meta_df['release_date'].dt.year.fillna(0).astype(int)
-# meta_df['join_key'] = meta_df['title'].apply(get_clean_join_key)
-#
-# # Keep only the columns we want to attach to the final dataset
-# cols_to_keep = ['join_key', 'year_meta', 'revenue', 'budget', 'overview', 'poster_path', 'runtime', 'original_language']
-# meta_subset = meta_df[cols_to_keep].copy()
-#
-# # Drop duplicates inside metadata to reduce memory usage during merge
-# meta_subset = meta_subset.drop_duplicates(subset=['join_key', 'year_meta'])
-#
-# # --- 4. Find best match per movie (closest year among same-title candidates) ---
-# print("Matching metadata to unique movies...")
-#
-# # Merge by join_key first (may create multiple candidate matches per movie)
-# candidates = pd.merge(unique_movies, meta_subset, on='join_key', how='left')
-#
-# # Compute year difference for each candidate
-# candidates['year_diff'] = candidates.apply(calculate_diff, axis=1)
-#
-# # Sort so that the best match becomes the first row per (Title, Release_Year)
-# candidates.sort_values(by=['Title', 'Release_Year', 'year_diff'], ascending=[True, True, True], inplace=True)
-#
-# # Keep only the best match per movie
-# best_matches = candidates.drop_duplicates(subset=['Title', 'Release_Year'], keep='first')
-#
-# # Remove helper columns before the final merge back into the full dataset
-# cols_to_drop = ['join_key', 'year_main', 'year_meta', 'year_diff']
-# best_matches = best_matches.drop(columns=cols_to_drop)
-#
-# # --- 5. Final merge back into the original full dataset ---
-# print("Applying matched data back to original full dataset...")
-# final_df = pd.merge(main_df, best_matches, on=['Title', 'Release_Year'], how='left')
-#
-# # --- 6. Save + basic validation ---
-# output_filename = 'final_movies_dataset_enriched_full.csv'
-# final_df.to_csv(output_filename, index=False)
-#
-# print("-" * 30)
-# print(f"Process complete.")
-# print(f"Original Rows: {len(main_df)}")
-# print(f"Final Rows:    {len(final_df)} (Must be equal!)")
-# print(f"Rows with Revenue: {final_df['revenue'].notna().sum()}")
-#
-# # Quick sanity check on a known title (should appear multiple times if there are many ratings rows)
-# print("\nDebug Check (Granularity):")
-# sample_movie = 'Swimming with Sharks'
-# sample_rows = final_df[final_df['Title'].str.contains(sample_movie, na=False, case=False)]
-# print(f"Movie: {sample_movie}")
-# print(f"Number of rating rows found: {len(sample_rows)} (Should be > 1)")
-# if not sample_rows.empty:
-#     print(f"Revenue attached: {sample_rows['revenue'].iloc[0]}")
-
-# Load the enriched output and preview the first 50 rows
-data = pd.read_csv('final_movies_dataset_enriched_full.csv')
-print(data.head(50).to_string())
\ No newline at end of file
+MAIN_FILE = 'final_movies_dataset.csv'
+META_FILE = 'movies_metadata.csv'
+OUTPUT_FILE = 'final_movies_dataset_enriched_full.csv'
+
+# Keep only the columns we want to attach to the final dataset
+META_COLUMNS = ['join_key', 'year_meta', 'revenue', 'budget', 'overview', 'poster_path', 'runtime', 'original_language']
+
+
+# --- Helper functions for cleaning/matching ---
+def normalize_titles(titles):
+    """
+    Normalized key per movie title, for robust matching (vectorized, each distinct title done once):
+    '&' -> 'and', drop "(...)", lowercase, keep [a-z0-9 ], sort the words.
+    Non-string titles get "".
+    """
+    codes, uniques = pd.factorize(pd.Series(titles), use_na_sentinel=True)
+    text = pd.Series(uniques, dtype=object).where(lambda s: s.map(type) == str)
+
+    text = text.str.replace('&', 'and', regex=False)              # Replace '&' with 'and'
+    text = text.str.replace(r'\([^)]*\)', '', regex=True)         # Remove parentheses and their content
+    text = text.str.lower()                                       # Lowercase
+    text = text.str.replace(r'[^a-z0-9\s]', '', regex=True)       # Keep only letters, numbers, and spaces
+
+    # Sort words to reduce ordering issues
+    keys = text.str.split().map(sorted, na_action='ignore').str.join(' ').fillna('')
+
+    return np.append(keys.to_numpy(dtype=object), '')[codes]  # code -1 (NaN title) -> ""
+
+
+def match_closest_year(unique_movies, meta_subset):
+    """
+    Best metadata row per movie: same join_key, closest year.
+    Candidates with a revenue win over candidates without one (like the old year_diff=9999 rule).
+    One as-of join per pool instead of exploding and sorting every candidate pair.
+    """
+    left = unique_movies.sort_values('year_main', kind='stable')
+    best = None
+    for pool in (meta_subset[meta_subset['revenue'].notna()], meta_subset):
+        right = pool.sort_values('year_meta', kind='stable')
+        matched = pd.merge_asof(left, right, left_on='year_main', right_on='year_meta',
+                                by='join_key', direction='nearest')
+        if best is None:
+            best = matched
+        else:
+            # Fall back to the second pool only for movies the first one could not match
+            missing = best['year_meta'].isna()
+            best = pd.concat([best[~missing], matched[missing]]).sort_index()
+    return best
+
+
+def prepare_meta(meta_df):
+    meta_df['release_date'] = pd.to_datetime(meta_df['release_date'], errors='coerce')
+    meta_df['year_meta'] = meta_df['release_date'].dt.year.fillna(0).astype(int)
+    meta_df['join_key'] = normalize_titles(meta_df['title'])
+
+    meta_subset = meta_df[META_COLUMNS].copy()
+
+    # Drop duplicates inside metadata to reduce memory usage during merge
+    return meta_subset.drop_duplicates(subset=['join_key', 'year_meta'])
+
+
+def prepare_unique_movies(main_df):
+    # Build unique movie list (avoid working on the full huge table first)
+    unique_movies = main_df[['Title', 'Release_Year']].drop_duplicates().copy()
+
+    # Prepare join keys + numeric year in the main dataset
+    unique_movies['join_key'] = normalize_titles(unique_movies['Title'])
+    unique_movies['year_main'] = pd.to_numeric(unique_movies['Release_Year'], errors='coerce').fillna(0).astype(int)
+    return unique_movies
+
+
+def run(main_file=MAIN_FILE, meta_file=META_FILE, output_file=OUTPUT_FILE, fuzzy=False):
+    # --- 1. Load data ---
+    print("Loading data...")
+    main_df = pd.read_csv(main_file, low_memory=False)
+    meta_df = pd.read_csv(meta_file, low_memory=False)
+
+    # Strip column name whitespace to avoid subtle merge/key issues
+    main_df.columns = main_df.columns.str.strip()
+
+    # --- 2. Build unique movie list ---
+    print("Creating unique movies list for matching...")
+    unique_movies = prepare_unique_movies(main_df)
+
+    # --- 3. Prepare metadata ---
+    print("Preparing metadata...")
+    meta_subset = prepare_meta(meta_df)
+
+    # --- 4. Find best match per movie (closest year among same-title candidates) ---
+    print("Matching metadata to unique movies...")
+    best_matches = match_closest_year(unique_movies, meta_subset)
+    if fuzzy:
+        # Titles with no exact join_key match (typos, subtitles, articles) -> blocked fuzzy matching
+        print("Fuzzy-matching the remaining titles...")
+        best_matches = fill_unmatched(best_matches, meta_subset)
+
+    # Remove helper columns before the final merge back into the full dataset
+    best_matches = best_matches.drop(columns=['join_key', 'year_main', 'year_meta'])
+
+    # --- 5. Final merge back into the original full dataset ---
+    print("Applying matched data back to original full dataset...")
+    final_df = pd.merge(main_df, best_matches, on=['Title', 'Release_Year'], how='left')
+
+    # --- 6. Save + basic validation ---
+    final_df.to_csv(output_file, index=False)
+
+    print("-" * 30)
+    print(f"Process complete.")
+    print(f"Original Rows: {len(main_df)}")
+    print(f"Final Rows:    {len(final_df)} (Must be equal!)")
+    print(f"Rows with Revenue: {final_df['revenue'].notna().sum()}")
+
+    # Quick sanity check on a known title (should appear multiple times if there are many ratings rows)
+    print("\nDebug Check (Granularity):")
+    sample_movie = 'Swimming with Sharks'
+    sample_rows = final_df[final_df['Title'].str.contains(sample_movie, na=False, case=False)]
+    print(f"Movie: {sample_movie}")
+    print(f"Number of rating rows found: {len(sample_rows)} (Should be > 1)")
+    if not sample_rows.empty:
+        print(f"Revenue attached: {sample_rows['revenue'].iloc[0]}")
+    return len(final_df)
+
+
+def preview(output_file=OUTPUT_FILE):
+    # Load the enriched output and preview the first 50 rows
+    data = pd.read_csv(output_file, nrows=50)
+    print(data.to_string())
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["preview"]:
+        preview()
+    else:
+        run(fuzzy="--fuzzy" in sys.argv[1:])
@@ -0,0 +1,311 @@
+import glob
+import logging
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# ============================================================
+#  Goal:
+#  Keep the ratings extract in a columnar, typed file (Parquet) so the
+#  dashboard can read only the columns it needs instead of re-parsing
+#  the whole CSV on every cold start.
+#
+#  Build:  python datastore.py [usa_ratings_lite.csv] [usa_ratings_lite.parquet]
+#
+#  adding_features.py can also write a star schema: a ratings fact table
+#  (movie_id, user, zip, rating) + one row per movie in a movies dimension.
+#  read_ratings() joins movie columns onto ratings only when they are asked for.
+#  Which of the two the ratings come from is a setting (RATINGS_SOURCE), never a guess
+#  from which files happen to exist, and every read logs the source it used.
+#
+#  Memory report for any CSV:  python datastore.py report final_project_data_ready.csv
+# ============================================================
+
+RATINGS_CSV = "usa_ratings_lite.csv"
+RATINGS_PARQUET = "usa_ratings_lite.parquet"
+RATINGS_FACT_DIR = "ratings_fact"        # directory of Parquet parts
+MOVIES_DIM = "movies_dim.parquet"
+LITE_COLUMNS = ["user_id", "Zip-code", "rating", "Title"]  # one row per rating in usa_ratings_lite.csv
+ROW_GROUP_ROWS = 131_072  # Parquet row group size: the unit read_ratings_sample picks at random (smaller ->
+                          # finer samples, but every group repeats the ZIP / title dictionaries: larger, slower file)
+
+# "lite": usa_ratings_lite (Parquet extract, else - or if it is older - the CSV) - what the dashboard has always shown
+# "star": the ratings fact table written by adding_features.py (+ incremental_ingest.py batches)
+RATINGS_SOURCES = ["lite", "star"]
+RATINGS_SOURCE = os.environ.get("RATINGS_SOURCE", "lite")
+
+logger = logging.getLogger("datastore")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s [%(name)s] %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+# Per-movie fields (live in the movies dimension, never repeated per rating)
+MOVIE_COLUMNS = ["Title", "Release_Year", "revenue", "budget", "overview", "poster_path",
+                 "runtime", "original_language", "Genres"]
+MOVIE_STAT_COLUMNS = ["Rating_Count", "Avg_Rating", "Controversy_Score", "ROI", "Decade"]
+
+# Columns that should always be stored as categoricals (few distinct values, repeated a lot)
+CATEGORICAL_COLUMNS = ["Zip-code", "State_Code", "State", "City_Name", "Title", "Genres",
+                       "original_language", "Gender", "Occupation"]
+
+# Most compact dtype for every column we know. Ratings are half-stars, so float32 is exact.
+# budget/revenue stay float64 (values up to ~3e9 would lose digits in float32 -> ROI drift).
+COLUMN_DTYPES = {
+    "rating": "float32",
+    "user_id": "int32", "movie_id": "int32", "Age": "int8",
+    "Release_Year": "int16", "Decade": "int16", "runtime": "float32",
+    "lat": "float32", "lon": "float32",
+    "budget": "float64", "revenue": "float64",
+    "Rating_Count": "int32", "Avg_Rating": "float32", "Controversy_Score": "float32", "ROI": "float32",
+    **{col: "category" for col in CATEGORICAL_COLUMNS},
+}
+
+# Wide free-text columns: skipped by read_csv_compact unless the caller asks for them
+TEXT_COLUMNS = ["overview", "poster_path"]
+
+
+def normalize_zip(series):
+    # "12345-6789" / " 2138" -> "12345" / "02138"
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Normalize the (few) categories only, then remap the codes
+        norm = normalize_zip(pd.Series(series.cat.categories.astype(str)))
+        codes, uniques = pd.factorize(norm)
+        codes = np.append(codes, -1)[series.cat.codes.to_numpy()]
+        return pd.Series(pd.Categorical.from_codes(codes, categories=uniques), index=series.index, name=series.name)
+    return series.astype(str).str.split("-").str[0].str.strip().str.zfill(5)
+
+
+def compact_dtypes(df):
+    # Known columns -> COLUMN_DTYPES; others: downcast numbers, low-cardinality strings -> categoricals
+    for col in df.columns:
+        s = df[col]
+        dtype = COLUMN_DTYPES.get(col)
+        if dtype == "category":
+            df[col] = s.astype("category")
+        elif dtype is not None:
+            s = pd.to_numeric(s, errors="coerce")
+            # Integer targets only when nothing is missing (NaN can't live in int columns -> float32)
+            df[col] = s.astype(dtype) if not (dtype.startswith("int") and s.isna().any()) else s.astype("float32")
+        elif pd.api.types.is_integer_dtype(s):
+            df[col] = pd.to_numeric(s, downcast="integer")
+        elif pd.api.types.is_float_dtype(s):
+            df[col] = s.astype("float32")
+        elif (s.dtype == object or pd.api.types.is_string_dtype(s)) and s.nunique(dropna=True) < 0.5 * len(s):
+            df[col] = s.astype("category")
+    return df
+
+
+def memory_report(before, after=None):
+    # Per-column deep memory usage (MB), optionally before vs after
+    rows = pd.DataFrame({"dtype": before.dtypes.astype(str),
+                         "MB": before.memory_usage(deep=True, index=False) / 1e6})
+    if after is not None:
+        rows["dtype_after"] = after.dtypes.astype(str).reindex(rows.index).fillna("(skipped)")
+        rows["MB_after"] = (after.memory_usage(deep=True, index=False) / 1e6).reindex(rows.index).fillna(0)
+    rows.loc["TOTAL"] = rows.sum(numeric_only=True)
+    rows = rows.fillna("")
+    print(rows.to_string(float_format=lambda x: f"{x:,.2f}"))
+    return rows
+
+
+def read_csv_compact(path, usecols=None, keep_text=False, report=False, **kwargs):
+    """
+    pd.read_csv with every known column in its most compact dtype.
+    Categorical columns are parsed straight into categoricals; wide text columns are skipped
+    unless keep_text=True (or they are listed in usecols). report=True parses the file a second
+    time with default dtypes to print the before/after footprint.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    if usecols is None:
+        usecols = [c for c in header if keep_text or c not in TEXT_COLUMNS]
+    dtypes = {c: "category" for c in usecols if COLUMN_DTYPES.get(c.strip()) == "category"}
+
+    df = pd.read_csv(path, usecols=usecols, dtype=dtypes, low_memory=False, **kwargs)
+    df.columns = df.columns.str.strip()
+    if not report:
+        return compact_dtypes(df)
+
+    before = pd.read_csv(path, usecols=usecols, low_memory=False, **kwargs)
+    before.columns = before.columns.str.strip()
+    df = compact_dtypes(df)
+    print(f"Memory report for {path}:")
+    memory_report(before, df)
+    return df
+
+
+def build_columnar(csv_path=RATINGS_CSV, out_path=RATINGS_PARQUET):
+    print(f"Reading {csv_path}...")
+    df = read_csv_compact(csv_path, keep_text=True)
+
+    # Normalize ZIPs once here, so the dashboard never has to string-split them again
+    df["Zip-code"] = normalize_zip(df["Zip-code"])
+
+    df.to_parquet(out_path, index=False, row_group_size=ROW_GROUP_ROWS)
+    print(f"Saved {len(df)} rows to {out_path} ({os.path.getsize(out_path) / 1e6:.1f} MB)")
+    return len(df)
+
+
+def build_lite_csv(out_path=RATINGS_CSV):
+    # usa_ratings_lite.csv from the star schema (adding_features.py output), one fact part at a time:
+    # the fact columns of LITE_COLUMNS + Title from the movies dimension
+    require_star_schema()
+    dim = pd.read_parquet(MOVIES_DIM, columns=["movie_id", "Title"]).set_index("movie_id")["Title"]
+    titles = dim.reindex(range(-1, int(dim.index.max()) + 1)).to_numpy()  # position movie_id + 1; -1 -> NaN
+
+    n_rows = 0
+    for i, part in enumerate(sorted(glob.glob(os.path.join(RATINGS_FACT_DIR, "*.parquet")))):
+        names = pq.read_schema(part).names
+        fact = pd.read_parquet(part, columns=["movie_id"] + [c for c in LITE_COLUMNS if c in names])
+        fact["Title"] = titles[fact.pop("movie_id").to_numpy().astype(np.int64) + 1]
+        fact[[c for c in LITE_COLUMNS if c in fact.columns]].to_csv(out_path, mode="w" if i == 0 else "a",
+                                                                  header=i == 0, index=False)
+        n_rows += len(fact)
+    print(f"Saved {n_rows:,} ratings to {out_path}")
+    return n_rows
+
+
+def has_star_schema():
+    return os.path.isdir(RATINGS_FACT_DIR) and os.path.exists(MOVIES_DIM)
+
+
+def ratings_source(source=None):
+    # The configured source (RATINGS_SOURCE environment variable, default "lite") unless one is passed
+    source = source or RATINGS_SOURCE
+    if source not in RATINGS_SOURCES:
+        raise ValueError(f"Unknown ratings source {source!r} (expected one of {RATINGS_SOURCES})")
+    return source
+
+
+def ratings_paths(columns=("Zip-code", "rating"), source=None):
+    # Files read_ratings(columns, source) reads: for "lite" the extract and the CSV it falls back to
+    if ratings_source(source) == "star":
+        movie_cols = [c for c in columns if c in MOVIE_COLUMNS or c in MOVIE_STAT_COLUMNS]
+        return [RATINGS_FACT_DIR, MOVIES_DIM] if movie_cols else [RATINGS_FACT_DIR]
+    return [RATINGS_PARQUET, RATINGS_CSV]
+
+
+def lite_parquet_is_current():
+    # The Parquet extract, unless the CSV it is built from changed after it (a refreshed CSV is never ignored)
+    if not os.path.exists(RATINGS_PARQUET):
+        return False
+    if os.path.exists(RATINGS_CSV) and os.path.getmtime(RATINGS_CSV) > os.path.getmtime(RATINGS_PARQUET):
+        logger.warning("%s is newer than %s - reading the CSV; rebuild the extract with: python datastore.py",
+                       RATINGS_CSV, RATINGS_PARQUET)
+        return False
+    return True
+
+
+def require_star_schema():
+    if not has_star_schema():
+        raise FileNotFoundError(f"Ratings source 'star' needs {RATINGS_FACT_DIR}/ and {MOVIES_DIM} "
+                                f"- run adding_features.py first")
+
+
+def read_star(columns):
+    # Fact columns straight from the fact table; movie columns via a movie_id take() on the dimension
+    movie_cols = [c for c in columns if c in MOVIE_COLUMNS or c in MOVIE_STAT_COLUMNS]
+    fact_cols = [c for c in columns if c not in movie_cols]
+    if movie_cols and "movie_id" not in fact_cols:
+        fact_cols.append("movie_id")
+
+    df = pd.read_parquet(RATINGS_FACT_DIR, columns=fact_cols, memory_map=True)
+    if movie_cols:
+        dim = pd.read_parquet(MOVIES_DIM, columns=["movie_id"] + movie_cols)
+        dim = dim.set_index("movie_id").reindex(range(int(dim["movie_id"].max()) + 2))
+        ids = df["movie_id"].to_numpy()
+        pos = ids.copy()
+        pos[ids < 0] = len(dim) - 1  # movie_id -1 (no Title/Release_Year) -> the all-NaN last row
+        for col in movie_cols:
+            df[col] = dim[col].iloc[pos].reset_index(drop=True)
+    return df[columns]
+
+
+def read_ratings(columns=("Zip-code", "rating"), source=None):
+    """
+    Read only the requested rating columns from the configured source (see ratings_source).
+    "star": the fact table (memory-mapped), movie columns joined from the dimension.
+    "lite": the Parquet extract (memory-mapped), falling back to the CSV when it is missing or older than the CSV.
+    """
+    columns = list(columns)
+    source = ratings_source(source)
+    if source == "star":
+        require_star_schema()
+        logger.info("ratings source: star (%s/)", RATINGS_FACT_DIR)
+        return read_star(columns)
+    if lite_parquet_is_current():
+        logger.info("ratings source: lite (%s)", RATINGS_PARQUET)
+        return pd.read_parquet(RATINGS_PARQUET, columns=columns, memory_map=True)
+
+    logger.info("ratings source: lite (%s)", RATINGS_CSV)
+    df = read_csv_compact(RATINGS_CSV, usecols=columns)
+    if "Zip-code" in df.columns:
+        df["Zip-code"] = normalize_zip(df["Zip-code"])
+    return df
+
+
+def read_ratings_sample(columns=("Zip-code", "rating"), frac=0.02, min_groups=8, seed=0, source=None):
+    """
+    About frac of the rating rows of the configured source, read without loading the rest:
+    whole Parquet row groups picked at random (at least min_groups of them, or all there are),
+    or random lines of the CSV. Rating columns only (no movie columns from the dimension).
+    Returns (ratings, rate) with rate = rows read / all rows.
+    """
+    columns = list(columns)
+    source = ratings_source(source)
+    rng = np.random.default_rng(seed)
+    if source == "star":
+        require_star_schema()
+        paths = sorted(glob.glob(os.path.join(RATINGS_FACT_DIR, "*.parquet")))
+    elif lite_parquet_is_current():
+        paths = [RATINGS_PARQUET]
+    else:
+        # CSV: every line is still scanned, but only the kept ones are parsed into columns
+        n_lines = [0]
+
+        def skip(i):
+            if i == 0:
+                return False  # header
+            n_lines[0] += 1
+            return rng.random() >= frac
+
+        df = read_csv_compact(RATINGS_CSV, usecols=columns, skiprows=skip)
+        if "Zip-code" in df.columns:
+            df["Zip-code"] = normalize_zip(df["Zip-code"])
+        logger.info("ratings sample: lite (%s), %d of %d rows", RATINGS_CSV, len(df), n_lines[0])
+        return df, len(df) / max(n_lines[0], 1)
+
+    # (file, row group, rows) of every row group, then random ones until the sample is large enough
+    groups = []
+    for path in paths:
+        meta = pq.ParquetFile(path).metadata
+        groups += [(path, i, meta.row_group(i).num_rows) for i in range(meta.num_row_groups)]
+    total = sum(rows for _, _, rows in groups)
+    picked, n_rows = [], 0
+    for g in rng.permutation(len(groups)):
+        if n_rows >= frac * total and len(picked) >= min_groups:
+            break
+        picked.append(groups[g])
+        n_rows += groups[g][2]
+
+    parts = []
+    for path in paths:
+        ids = sorted(i for p, i, _ in picked if p == path)
+        if ids:
+            parts.append(pq.ParquetFile(path, memory_map=True).read_row_groups(ids, columns=columns).to_pandas())
+    df = pd.concat(parts, ignore_index=True)
+    if "Zip-code" in df.columns and not isinstance(df["Zip-code"].dtype, pd.CategoricalDtype):
+        df["Zip-code"] = df["Zip-code"].astype("category")  # parts with different ZIP sets concat to object
+    logger.info("ratings sample: %s, %d row groups of %d, %d of %d rows", source, len(picked), len(groups), n_rows, total)
+    return df, n_rows / max(total, 1)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["report"]:
+        read_csv_compact(sys.argv[2] if len(sys.argv) > 2 else RATINGS_CSV, keep_text=True, report=True)
+    else:
+        build_columnar(*sys.argv[1:3])
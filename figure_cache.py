@@ -0,0 +1,53 @@
+import threading
+from collections import OrderedDict
+
+# ============================================================
+#  Goal:
+#  Process-wide LRU of finished Plotly figures, shared by all dashboard sessions.
+#  Key: (view, state, metric_mode, min_zip_votes, dataset version). A repeat view
+#  skips the pandas filtering, the GeoJSON subset and the trace construction/validation.
+#  Bounded by the serialized (JSON) size of the cached figures, not by their count,
+#  because one drilldown with its embedded GeoJSON can outweigh dozens of state maps.
+# ============================================================
+
+MAX_CACHE_MB = 256
+
+
+class FigureCache:
+    def __init__(self, max_bytes=MAX_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()  # key -> (figure, serialized bytes)
+        self._lock = threading.Lock()  # sessions run in separate script threads
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, fig):
+        # Cached figures are shared between sessions: never modify one after put()
+        size = len(fig.to_json())
+        if size > self.max_bytes:
+            return fig
+        with self._lock:
+            if key in self._items:
+                self.total_bytes -= self._items.pop(key)[1]
+            self._items[key] = (fig, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.total_bytes -= evicted
+        return fig
+
+    def stats(self):
+        with self._lock:
+            return {"figures": len(self._items), "MB": self.total_bytes / 1e6,
+                    "hits": self.hits, "misses": self.misses}
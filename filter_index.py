@@ -0,0 +1,168 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from aggregates import aggregates_from_sums
+from datastore import MOVIES_DIM, RATINGS_FACT_DIR, has_star_schema, read_ratings
+from stamps import input_stamp, stamp_is_current
+from zip_lookup import ZIP_LOOKUP_PATH, attach_geo, load_zip_arrays
+
+# ============================================================
+#  Goal:
+#  Genre / decade / single-movie filters for the map without masking and regrouping
+#  every rating row per click. Ratings are stored once sorted by movie_id, so a movie
+#  is a contiguous slice; each genre and decade gets a sorted row-index array. A filter
+#  is an intersection of those arrays, and the filtered aggregation is three bincounts
+#  over a small ZIP table. All arrays are .npy files, memory-mapped read-only.
+#
+#  Build (after adding_features.py):  python filter_index.py
+# ============================================================
+
+FILTER_INDEX_DIR = "filter_index"
+META_FILE = "meta.json"
+FILTER_INDEX_INPUTS = [RATINGS_FACT_DIR, MOVIES_DIM, ZIP_LOOKUP_PATH]  # everything the index is built from
+
+
+def split_genres(genres):
+    # "Action|Comedy", "Action, Comedy" or "['Action', 'Comedy']" -> list of names per movie
+    cleaned = genres.fillna("").astype(str).str.replace(r"[\[\]'\"]", "", regex=True)
+    return cleaned.str.split(r"\s*[|,]\s*", regex=True).map(lambda g: [x for x in g if x])
+
+
+def movie_attributes():
+    # movie_id + whichever of Title / Release_Year / Genres / Decade the dimension has
+    available = set(pq.read_schema(MOVIES_DIM).names)
+    columns = [c for c in ["movie_id", "Title", "Release_Year", "Genres", "Decade"] if c in available]
+    return pd.read_parquet(MOVIES_DIM, columns=columns)
+
+
+def rows_for_movies(offsets, movie_ids):
+    # Concatenated row ranges of these movies (rows are sorted by movie_id -> result is sorted)
+    movie_ids = np.sort(np.asarray(movie_ids, dtype=np.int64))
+    movie_ids = movie_ids[(movie_ids >= 0) & (movie_ids < len(offsets) - 1)]
+    starts, ends = offsets[movie_ids], offsets[movie_ids + 1]
+    lengths = ends - starts
+    if lengths.sum() == 0:
+        return np.empty(0, dtype=np.int32)
+    # arange per range without a Python loop: global positions minus each range's shift
+    shift = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+    return (np.arange(lengths.sum()) + shift).astype(np.int32)
+
+
+def build_filter_index(out_dir=FILTER_INDEX_DIR):
+    if not has_star_schema():
+        raise SystemExit("No ratings fact table / movies dimension found - run adding_features.py first.")
+    stamp = input_stamp(FILTER_INDEX_INPUTS)
+
+    print("Reading ratings...")
+    geo = attach_geo(read_ratings(["movie_id", "Zip-code", "rating"], source="star"), load_zip_arrays())
+
+    # ZIP table: one row per ZIP that has ratings; ratings refer to it by position
+    zip_pos, _ = pd.factorize(geo["Zip-code"].astype(str))
+    _, first = np.unique(zip_pos, return_index=True)
+    zips = geo.iloc[first][["State_Code", "State", "Zip-code"]].astype(str).reset_index(drop=True)
+
+    # Ratings sorted by movie_id: a movie's rows are offsets[m]:offsets[m + 1]
+    movie_id = geo["movie_id"].to_numpy()
+    order = np.argsort(movie_id, kind="stable")
+    movie_id = movie_id[order]
+    offsets = np.searchsorted(movie_id, np.arange(max(int(movie_id.max()), 0) + 2)).astype(np.int64)
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "zip_pos.npy"), zip_pos[order].astype(np.int32))
+    np.save(os.path.join(out_dir, "rating.npy"), geo["rating"].to_numpy(dtype=np.float32)[order])
+    np.save(os.path.join(out_dir, "movie_offsets.npy"), offsets)
+    zips.to_parquet(os.path.join(out_dir, "zips.parquet"), index=False)
+
+    # One sorted row-index array per genre / decade
+    movies = movie_attributes()
+    filters = {"genre": {}, "decade": {}}
+    if "Genres" in movies.columns:
+        exploded = movies.assign(genre=split_genres(movies["Genres"])).explode("genre").dropna(subset=["genre"])
+        for i, (genre, ids) in enumerate(exploded.groupby("genre")["movie_id"]):
+            filters["genre"][genre] = f"genre_{i:03d}.npy"
+            np.save(os.path.join(out_dir, filters["genre"][genre]), rows_for_movies(offsets, ids))
+    if "Decade" in movies.columns:
+        decades = pd.to_numeric(movies["Decade"], errors="coerce")
+        for decade, ids in movies["movie_id"].groupby(decades.dropna().astype(int)):
+            filters["decade"][str(decade)] = f"decade_{decade}.npy"
+            np.save(os.path.join(out_dir, filters["decade"][str(decade)]), rows_for_movies(offsets, ids))
+
+    meta = {"inputs_stamp": stamp, "rows": len(order), "zips": len(zips), **filters}
+    with open(os.path.join(out_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    print(f"Filter index: {len(order):,} ratings, {len(zips):,} ZIPs, "
+          f"{len(filters['genre'])} genres, {len(filters['decade'])} decades -> {out_dir}/")
+    return len(order)
+
+
+def load_filter_index(index_dir=FILTER_INDEX_DIR, check=True):
+    """
+    The index with every array memory-mapped read-only, or None if it is missing
+    or its input files changed content since it was built (check=False skips that).
+    """
+    meta_path = os.path.join(index_dir, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if check and not stamp_is_current(meta.get("inputs_stamp"), FILTER_INDEX_INPUTS):
+        return None
+
+    def load(name):
+        return np.load(os.path.join(index_dir, name), mmap_mode="r")
+
+    movies = movie_attributes()
+    offsets = load("movie_offsets.npy")
+    rated = movies["movie_id"].to_numpy()
+    rated = (rated >= 0) & (rated < len(offsets) - 1)
+    movies = movies[rated]
+    ids = movies["movie_id"].to_numpy()
+    movies = movies[offsets[ids + 1] > offsets[ids]]
+
+    return {
+        "meta": meta,
+        "zip_pos": load("zip_pos.npy"),
+        "rating": load("rating.npy"),
+        "movie_offsets": offsets,
+        "zips": pd.read_parquet(os.path.join(index_dir, "zips.parquet")),
+        "genre": {name: load(file) for name, file in meta["genre"].items()},
+        "decade": {int(name): load(file) for name, file in meta["decade"].items()},
+        "movies": movies.sort_values(["Title", "movie_id"]).reset_index(drop=True),
+    }
+
+
+def select_rows(index, genre=None, decade=None, movie_id=None):
+    # Sorted row positions matching all given filters (None = no filter on that attribute)
+    if movie_id is not None:
+        offsets = index["movie_offsets"]
+        rows = np.arange(offsets[movie_id], offsets[movie_id + 1], dtype=np.int32)
+    else:
+        rows = None
+    for arrays, key in ((index["genre"], genre), (index["decade"], decade)):
+        if key is None:
+            continue
+        subset = arrays.get(key, np.empty(0, dtype=np.int32))
+        rows = subset if rows is None else np.intersect1d(rows, subset, assume_unique=True)
+    return rows
+
+
+def filtered_aggregates(index, rows):
+    """(state_stats, zip_stats) of the selected rating rows, same columns as the unfiltered aggregates."""
+    zip_pos = index["zip_pos"][rows]
+    rating = index["rating"][rows].astype(np.float64)
+
+    n = len(index["zips"])
+    count = np.bincount(zip_pos, minlength=n)
+    total = np.bincount(zip_pos, weights=rating, minlength=n)
+    total_sq = np.bincount(zip_pos, weights=rating * rating, minlength=n)
+
+    return aggregates_from_sums(index["zips"].assign(count=count, sum=total, sumsq=total_sq))
+
+
+if __name__ == "__main__":
+    build_filter_index(*sys.argv[1:2])
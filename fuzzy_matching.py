@@ -0,0 +1,243 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# ============================================================
+#  Goal:
+#  Fuzzy fallback for titles whose join_key has no exact match in movies_metadata.csv
+#  (typos, subtitles, articles). An inverted index over character trigrams gives each
+#  title a small block of candidates; only those are scored (trigram similarity + year
+#  distance), in parallel over a process pool.
+#  A near-identical title is usually another film of the same franchise, so candidates
+#  must also agree word by word: same sequel numbers ("4" / "IV"), no differing words on
+#  both sides (other subtitle), and typos or extra words on one side only for the same release.
+# ============================================================
+
+STOPWORDS = {"the", "a", "an", "and", "of"}
+MAX_BLOCK_POSTINGS = 5000  # block on the rarest grams of a title, up to this many postings
+TOP_K = 20                 # candidates scored per title
+MIN_SCORE = 0.7            # below this a title stays unmatched
+YEAR_PENALTY = 0.02        # per year of distance, capped at 10 years
+SAME_WORDS_SCORE = 0.9     # every word matches up to one typo
+MAX_YEAR_GAP_INEXACT = 1   # typos / "Title" vs "Title: Subtitle" only for the same release (sequels come later)
+ROMAN_NUMERALS = {"ii": "2", "iii": "3", "iv": "4", "v": "5", "vi": "6", "vii": "7", "viii": "8", "ix": "9",
+                  "x": "10"}
+
+
+def title_grams(join_key):
+    # Character trigrams of the (already normalized) key, articles dropped unless that empties it
+    words = join_key.split()
+    words = [w for w in words if w not in STOPWORDS] or words
+    grams = set()
+    for w in words:
+        w = f" {w} "
+        grams.update(w[i:i + 3] for i in range(len(w) - 2))
+    return grams
+
+
+def title_words(join_key):
+    # Words of the key (repeats kept), roman numerals as numbers ("toy story ii" -> ("2", "story", "toy"))
+    return tuple(sorted(ROMAN_NUMERALS.get(w, w) for w in join_key.split()))
+
+
+def sequel_markers(words):
+    # Numbers and roman numerals; they must be identical for the same film
+    return {ROMAN_NUMERALS.get(w, w) for w in words if w.isdigit() or w in ROMAN_NUMERALS}
+
+
+def within_one_edit(a, b):
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:]
+    return a[i:] == b[i + 1:]
+
+
+def align_words(words, other):
+    """
+    Pair each word with an equal word of other, then the rest with one-typo matches (3+ letters).
+    Every word of other is used at most once. -> (words of `words` left over, words of `other` left over, typos)
+    """
+    pool = list(other)
+    rest = []
+    for w in words:
+        if w in pool:
+            pool.remove(w)
+        else:
+            rest.append(w)
+    left, typos = [], 0
+    for w in rest:
+        match = next((v for v in pool if len(w) >= 3 and len(v) >= 3 and within_one_edit(w, v)), None)
+        if match is None:
+            left.append(w)
+        else:
+            pool.remove(match)
+            typos += 1
+    return [w for w in left if w not in STOPWORDS], [v for v in pool if v not in STOPWORDS], typos
+
+
+def word_check(query_words, cand_words, year_gap):
+    """
+    None if the candidate is another film (other sequel number / other subtitle), else the
+    similarity floor its words justify (SAME_WORDS_SCORE when all words match, 0 otherwise).
+    """
+    if sequel_markers(query_words) != sequel_markers(cand_words):
+        return None
+    extra_query, extra_cand, typos = align_words(query_words, cand_words)
+    if extra_query and extra_cand:
+        return None
+    if (extra_query or extra_cand or typos) and year_gap > MAX_YEAR_GAP_INEXACT:
+        return None
+    return 0.0 if extra_query or extra_cand else SAME_WORDS_SCORE
+
+
+def build_index(join_keys, years):
+    """
+    Inverted index: trigram -> sorted array of metadata row positions.
+    Also keeps the trigram set per row (for the exact similarity) and the years.
+    """
+    postings = {}
+    gram_sets, word_sets = [], []
+    for pos, key in enumerate(join_keys):
+        grams = frozenset(title_grams(key))
+        gram_sets.append(grams)
+        word_sets.append(title_words(key))
+        for g in grams:
+            postings.setdefault(g, []).append(pos)
+
+    postings = {g: np.array(p, dtype=np.int32) for g, p in postings.items()}
+    return {"postings": postings, "grams": gram_sets, "words": word_sets, "years": np.asarray(years, dtype=np.int32)}
+
+
+def best_candidate(join_key, year, index, full_key=None):
+    # -> (metadata row position, score), or (-1, 0.0); full_key: the whole title when join_key is a shortened one
+    grams = title_grams(join_key)
+    lists = sorted((index["postings"][g] for g in grams if g in index["postings"]), key=len)
+    if not grams or not lists:
+        return -1, 0.0
+
+    # Blocking: only the rarest grams generate candidates (common grams would pull in everything)
+    block, total = [], 0
+    for p in lists:
+        if block and total + len(p) > MAX_BLOCK_POSTINGS:
+            break
+        block.append(p)
+        total += len(p)
+    cand, hits = np.unique(np.concatenate(block), return_counts=True)
+    if len(cand) > TOP_K:
+        cand = cand[np.argpartition(-hits, TOP_K)[:TOP_K]]
+
+    # Jaccard on trigram sets; containment helps "Title" vs "Title: Long Subtitle"
+    shared = np.array([len(grams & index["grams"][c]) for c in cand])
+    sizes = np.array([len(index["grams"][c]) for c in cand])
+    jaccard = shared / (len(grams) + sizes - shared)
+    smaller = np.minimum(len(grams), sizes)
+    containment = np.where(smaller >= 8, 0.85 * shared / smaller, 0.0)
+    similarity = np.maximum(jaccard, containment)
+
+    year_gap = np.abs(index["years"][cand] - year)
+
+    # Word-level agreement with the whole title: rejects other films of the same franchise
+    query_words = title_words(full_key or join_key)
+    for i, c in enumerate(cand):
+        floor = word_check(query_words, index["words"][c], year_gap[i])
+        similarity[i] = -1.0 if floor is None else max(similarity[i], floor)
+    score = similarity - YEAR_PENALTY * np.minimum(year_gap, 10)
+
+    best = int(np.argmax(score))
+    if score[best] < MIN_SCORE:
+        return -1, 0.0
+    return int(cand[best]), float(score[best])
+
+
+# --- Process pool plumbing: the index is sent once per worker, not once per task ---
+_INDEX = None
+
+
+def _init_worker(index):
+    global _INDEX
+    _INDEX = index
+
+
+def _match_block(block):
+    keys, alt_keys, years = block
+    positions, scores = [], []
+    for key, alt_key, year in zip(keys, alt_keys, years):
+        pos, score = best_candidate(key, year, _INDEX)
+        if alt_key and alt_key != key:
+            # Title without its subtitle ("Dr. Strangelove or: How I Learned..." -> "Dr. Strangelove"),
+            # still checked word by word against the whole title
+            alt_pos, alt_score = best_candidate(alt_key, year, _INDEX, full_key=key)
+            if alt_score > score:
+                pos, score = alt_pos, alt_score
+        positions.append(pos)
+        scores.append(score)
+    return positions, scores
+
+
+def fuzzy_match(join_keys, years, meta_keys, meta_years, alt_keys=None, workers=None):
+    """
+    Best fuzzy metadata row per title (alt_keys: optional second key per title, e.g. without subtitle).
+    Returns (positions into meta_keys, -1 when unmatched; scores) and prints match rate + throughput.
+    """
+    t0 = time.perf_counter()
+    index = build_index(list(meta_keys), meta_years)
+    t_index = time.perf_counter() - t0
+
+    join_keys, years = list(join_keys), list(years)
+    workers = workers or os.cpu_count() or 1
+    block_size = max(100, -(-len(join_keys) // (workers * 4)))  # ~4 blocks per worker
+    alt_keys = list(alt_keys) if alt_keys is not None else [""] * len(join_keys)
+    blocks = [(join_keys[i:i + block_size], alt_keys[i:i + block_size], years[i:i + block_size])
+              for i in range(0, len(join_keys), block_size)]
+    positions, scores = [], []
+    if workers > 1 and len(blocks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(index,)) as pool:
+            for p, s in pool.map(_match_block, blocks):
+                positions += p
+                scores += s
+    else:
+        workers = 1
+        _init_worker(index)
+        for block in blocks:
+            p, s = _match_block(block)
+            positions += p
+            scores += s
+
+    elapsed = time.perf_counter() - t0
+    positions = np.array(positions, dtype=np.int64)
+    matched = int((positions >= 0).sum())
+    print(f"Fuzzy matching: {matched}/{len(join_keys)} titles matched "
+          f"({matched / max(1, len(join_keys)):.1%}), index {t_index:.2f}s, "
+          f"{len(join_keys) / max(elapsed, 1e-9):,.0f} titles/s with {workers} worker(s)")
+    return positions, np.array(scores)
+
+
+def fill_unmatched(best, meta_subset, workers=None):
+    # Fuzzy-match only the movies the exact join_key pass left without metadata
+    from data_merging import normalize_titles
+
+    missing = best['year_meta'].isna().to_numpy()
+    if not missing.any():
+        return best
+    todo = best[missing]
+    main_titles = todo['Title'].astype(str).str.split(r':| - ', n=1, regex=True).str[0]
+    positions, scores = fuzzy_match(todo['join_key'], todo['year_main'],
+                                    meta_subset['join_key'], meta_subset['year_meta'],
+                                    alt_keys=normalize_titles(main_titles), workers=workers)
+
+    hit = positions >= 0
+    meta_cols = [c for c in meta_subset.columns if c != 'join_key']
+    found = meta_subset.iloc[positions[hit]][meta_cols].to_numpy()
+
+    best = best.copy()
+    rows = np.flatnonzero(missing)[hit]
+    best.iloc[rows, [best.columns.get_loc(c) for c in meta_cols]] = found
+    return best
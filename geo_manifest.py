@@ -0,0 +1,168 @@
+import json
+import os
+import re
+import sys
+
+import numpy as np
+
+from zcta_shards import ZCTA_GEOJSON, detect_feature_key
+
+# ============================================================
+#  Goal:
+#  Describe a GeoJSON file without json.load-ing all of it: features are decoded one at a
+#  time from a block-wise read, so memory stays at one feature whatever the file size.
+#  The result (property schema, ZIP key, feature count, bounding box) goes into a small
+#  sidecar next to the file - zcta.geojson.json -> zcta.geojson.manifest.json - that the
+#  dashboard and the converter read instead of opening the GeoJSON itself.
+#  Replaces GENERAL.py (which loaded the whole file to print the first feature's keys).
+#
+#  Run:  python geo_manifest.py [zcta.geojson.json ...]
+# ============================================================
+
+MANIFEST_SUFFIX = ".manifest.json"
+BLOCK_SIZE = 1 << 20
+EXAMPLE_KEYS = 10  # properties of the first feature kept as examples
+
+FEATURES_RE = re.compile(r'"features"\s*:\s*\[')
+SEPARATOR_RE = re.compile(r"[\s,]*")
+
+
+def manifest_path(path):
+    return os.path.splitext(path)[0] + MANIFEST_SUFFIX
+
+
+def iter_features(path, block_size=BLOCK_SIZE):
+    """Yield the features of a FeatureCollection one by one, reading the file in blocks."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = ""
+        while True:
+            match = FEATURES_RE.search(buf)
+            if match:
+                break
+            block = f.read(block_size)
+            if not block:
+                return
+            buf += block
+        buf, pos = buf[match.end():], 0
+
+        while True:
+            pos = SEPARATOR_RE.match(buf, pos).end()
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                feature, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Feature cut at the end of the buffer: read more (at least as much as we hold -> no quadratic re-parsing)
+                block = f.read(max(block_size, len(buf) - pos))
+                if not block:
+                    if pos >= len(buf):
+                        return
+                    raise
+                buf, pos = buf[pos:] + block, 0
+                continue
+            yield feature
+            pos = end
+            if pos > block_size:
+                buf, pos = buf[pos:], 0
+
+
+def coordinate_bounds(coords):
+    # [minx, miny, maxx, maxy] of a position or any nesting of position lists
+    if not coords:
+        return None
+    if isinstance(coords[0], (int, float)):
+        return [coords[0], coords[1], coords[0], coords[1]]
+    if isinstance(coords[0][0], (int, float)):
+        xy = np.asarray(coords, dtype=float)[:, :2]
+        return [*xy.min(axis=0).tolist(), *xy.max(axis=0).tolist()]
+    return merge_bounds(coordinate_bounds(c) for c in coords)
+
+
+def geometry_bounds(geometry):
+    if not geometry:
+        return None
+    if geometry.get("type") == "GeometryCollection":
+        return merge_bounds(geometry_bounds(g) for g in geometry.get("geometries", []))
+    return coordinate_bounds(geometry.get("coordinates"))
+
+
+def merge_bounds(boxes):
+    boxes = [b for b in boxes if b]
+    if not boxes:
+        return None
+    b = np.array(boxes)
+    return [*b[:, :2].min(axis=0).tolist(), *b[:, 2:].max(axis=0).tolist()]
+
+
+def summarize_features(features):
+    """Manifest fields from any iterable of features (streamed, or already loaded by a caller)."""
+    first, count, bbox, geometry_types = None, 0, None, set()
+    for feat in features:
+        if first is None:
+            first = feat.get("properties") or {}
+        count += 1
+        geometry = feat.get("geometry")
+        if geometry:
+            geometry_types.add(geometry.get("type"))
+            bbox = merge_bounds([bbox, geometry_bounds(geometry)])
+    first = first or {}
+    return {
+        "feature_key": detect_feature_key(first),
+        "property_keys": list(first),
+        "example": {k: first[k] for k in list(first)[:EXAMPLE_KEYS]},
+        "geometry_types": sorted(geometry_types),
+        "feature_count": count,
+        "bbox": bbox,
+    }
+
+
+def write_manifest(path=ZCTA_GEOJSON, fields=None):
+    # fields: from summarize_features / the converter; streams the file when not given
+    if fields is None:
+        fields = summarize_features(iter_features(path))
+    st = os.stat(path)
+    manifest = {"source": os.path.basename(path), "bytes": st.st_size, "mtime_ns": st.st_mtime_ns, **fields}
+    with open(manifest_path(path), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(path=ZCTA_GEOJSON):
+    # The sidecar, or None if it is missing or the GeoJSON changed since it was written
+    side = manifest_path(path)
+    if not os.path.exists(side) or not os.path.exists(path):
+        return None
+    with open(side, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    st = os.stat(path)
+    if manifest.get("bytes") != st.st_size or manifest.get("mtime_ns") != st.st_mtime_ns:
+        return None
+    return manifest
+
+
+def geojson_feature_key(path=ZCTA_GEOJSON):
+    # ZIP property name: from the manifest, else from the first feature only (stops reading right there)
+    manifest = read_manifest(path)
+    if manifest is not None:
+        return manifest["feature_key"]
+    for feat in iter_features(path):
+        return detect_feature_key(feat.get("properties") or {})
+    return detect_feature_key({})
+
+
+def build_manifest(path=ZCTA_GEOJSON):
+    # Pipeline entry point: returns the feature count
+    return write_manifest(path)["feature_count"]
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:] or [ZCTA_GEOJSON]:
+        manifest = write_manifest(path)
+        print(f"{path}: {manifest['feature_count']:,} features, bbox {manifest['bbox']}, "
+              f"ZIP key {manifest['feature_key']} -> {manifest_path(path)}")
+        print("Keys in properties:")
+        print(manifest["property_keys"])
+        print("\nExample values:")
+        for k, v in manifest["example"].items():
+            print(k, "=", v)
@@ -0,0 +1,155 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from aggregates import calculate_weighted_rating, format_delta
+from datastore import ratings_paths, read_ratings
+from stamps import input_stamp, stamp_is_current
+from zip_lookup import N_ZIPS, ZIP_LOOKUP_PATH, load_zip_arrays, zip_to_int
+
+# ============================================================
+#  Goal:
+#  National ZIP-resolution view without drawing ~33k ZCTA polygons: ratings binned into
+#  a hexagonal grid (by the ZIP's lat/lon) at several resolutions, precomputed offline.
+#  Each cell keeps (count, sum, sum of squares), so mean / std / Weighted_Score / Delta
+#  are exact, and the number of cells - the figure payload - depends on the grid size,
+#  not on how many ratings there are.
+#
+#  Build (after zip_lookup.py):  python hexbin.py
+# ============================================================
+
+HEXBIN_FILE = "hexbin_cells.parquet"
+HEX_SIZES = [2.0, 1.0, 0.5, 0.25]  # hex radius in degrees of latitude, coarse -> fine
+HEXBIN_COLUMNS = ["Zip-code", "rating"]
+HEXBIN_INPUTS = ratings_paths(HEXBIN_COLUMNS) + [ZIP_LOOKUP_PATH]  # as read_ratings resolves them for the configured source
+REF_LAT = 38.0                     # longitudes are shrunk by cos(REF_LAT) so hexes look regular over the US
+SQRT3 = np.sqrt(3.0)
+
+
+def hex_axial(lat, lon, size):
+    # Pointy-top hex (axial q, r) containing each point, via cube-coordinate rounding
+    x = lon * np.cos(np.radians(REF_LAT)) / size
+    y = lat / size
+    q = SQRT3 / 3 * x - y / 3
+    r = 2 / 3 * y
+    s = -q - r
+    rq, rr, rs = np.rint(q), np.rint(r), np.rint(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype(np.int32), rr.astype(np.int32)
+
+
+def hex_center(q, r, size):
+    x = size * SQRT3 * (q + r / 2)
+    y = size * 1.5 * r
+    return y, x / np.cos(np.radians(REF_LAT))  # lat, lon
+
+
+def zip_sums_from_ratings():
+    # (count, sum, sumsq) per integer ZIP in three bincounts
+    ratings = read_ratings(HEXBIN_COLUMNS)
+    zip_int = zip_to_int(ratings["Zip-code"])
+    keep = (zip_int >= 0) & (zip_int < N_ZIPS)
+    zip_int = zip_int[keep]
+    rating = ratings["rating"].to_numpy(dtype=np.float64)[keep]
+    return pd.DataFrame({
+        "zip": np.arange(N_ZIPS),
+        "count": np.bincount(zip_int, minlength=N_ZIPS),
+        "sum": np.bincount(zip_int, weights=rating, minlength=N_ZIPS),
+        "sumsq": np.bincount(zip_int, weights=rating * rating, minlength=N_ZIPS),
+    })
+
+
+def zip_sums_from_stats(zip_stats):
+    # The same three sums recovered from aggregate columns (filtered / preview aggregates)
+    count = zip_stats["Rating_Count"].to_numpy(dtype=np.float64)
+    mean = zip_stats["Avg_Rating"].to_numpy(dtype=np.float64)
+    m2 = zip_stats["Controversy_Score"].to_numpy(dtype=np.float64) ** 2 * np.maximum(count - 1, 0)
+    return pd.DataFrame({
+        "zip": zip_to_int(zip_stats["Zip-code"]),
+        "count": count, "sum": count * mean, "sumsq": m2 + count * mean * mean,
+    })
+
+
+def bin_zip_sums(sums, arrays, sizes=HEX_SIZES):
+    """Hex cells of every resolution: size, q, r, lat, lon (cell center), State_Code (most ratings), n_zips, count, sum, sumsq."""
+    sums = sums[(sums["count"] > 0) & (sums["zip"] >= 0) & (sums["zip"] < N_ZIPS)]
+    sums = sums[arrays["valid"][sums["zip"].to_numpy()]]
+    zips = sums["zip"].to_numpy()
+    lat, lon = arrays["lat"][zips].astype(np.float64), arrays["lon"][zips].astype(np.float64)
+    state_codes, state_categories = arrays["State_Code"]
+
+    cells = []
+    for size in sizes:
+        q, r = hex_axial(lat, lon, size)
+        per_zip = pd.DataFrame({"q": q, "r": r, "state": state_codes[zips], "count": sums["count"].to_numpy(),
+                                "sum": sums["sum"].to_numpy(), "sumsq": sums["sumsq"].to_numpy()})
+        binned = per_zip.groupby(["q", "r"], sort=False).agg(
+            n_zips=("count", "size"), count=("count", "sum"), sum=("sum", "sum"), sumsq=("sumsq", "sum"))
+
+        # A cell can straddle a border: label it with the state that has most of its ratings
+        by_state = per_zip.groupby(["q", "r", "state"], sort=False)["count"].sum().reset_index()
+        top = by_state.sort_values("count", ascending=False).drop_duplicates(["q", "r"]).set_index(["q", "r"])
+        binned["State_Code"] = np.asarray(state_categories)[top["state"].reindex(binned.index).to_numpy()]
+
+        binned = binned.reset_index()
+        binned["lat"], binned["lon"] = hex_center(binned["q"].to_numpy(), binned["r"].to_numpy(), size)
+        binned.insert(0, "size", size)
+        cells.append(binned)
+    out = pd.concat(cells, ignore_index=True)
+    out["State_Code"] = out["State_Code"].astype("category")
+    return out[["size", "q", "r", "lat", "lon", "State_Code", "n_zips", "count", "sum", "sumsq"]]
+
+
+def build_hexbins(out_path=HEXBIN_FILE):
+    stamp = input_stamp(HEXBIN_INPUTS)
+    print("Reading ratings...")
+    cells = bin_zip_sums(zip_sums_from_ratings(), load_zip_arrays(ZIP_LOOKUP_PATH))
+
+    # Input stamp in the file metadata (like the rollup cube): cells built from other inputs are never used
+    table = pa.Table.from_pandas(cells, preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata, b"inputs_stamp": json.dumps(stamp).encode()})
+    pq.write_table(table, out_path)
+    sizes = ", ".join(f"{s}°: {n:,}" for s, n in cells.groupby("size", sort=False).size().items())
+    print(f"Hex bins ({sizes} cells, {os.path.getsize(out_path) / 1e6:.1f} MB) -> {out_path}")
+    return len(cells)
+
+
+def load_hexbins(path=HEXBIN_FILE, check=True):
+    # The cells, or None if the file is missing or its input files changed content since it was built
+    # (another ratings source lists other inputs -> also stale); check=False skips that
+    if not os.path.exists(path):
+        return None
+    metadata = pq.read_schema(path).metadata or {}
+    if check and not stamp_is_current(json.loads(metadata.get(b"inputs_stamp", b"null")), HEXBIN_INPUTS):
+        return None
+    return pd.read_parquet(path)
+
+
+def hex_stats(cells, size, c_global):
+    """Cells of one resolution with the dashboard's columns; Delta is against c_global (the map's U.S. mean)."""
+    cells = cells[(cells["size"] == size) & (cells["count"] > 0)].reset_index(drop=True)
+    count = cells["count"].astype("float64")
+    mean = cells["sum"] / count
+    m2 = (cells["sumsq"] - cells["sum"] * mean).clip(lower=0)
+    stats = pd.DataFrame({
+        "lat": cells["lat"], "lon": cells["lon"], "State_Code": cells["State_Code"].astype(str),
+        "n_zips": cells["n_zips"], "Rating_Count": cells["count"].round().astype("int64"), "Avg_Rating": mean,
+        "Controversy_Score": np.sqrt(m2 / (count - 1).where(count > 1)).fillna(0),
+    })
+    stats = calculate_weighted_rating(stats)
+    stats["Delta"] = stats["Avg_Rating"] - c_global
+    stats["Delta_fmt"] = format_delta(stats["Delta"])
+    return stats
+
+
+if __name__ == "__main__":
+    build_hexbins(*sys.argv[1:2])
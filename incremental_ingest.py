@@ -0,0 +1,193 @@
+import glob
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from adding_features import MOVIE_KEYS, compact_fact, fact_schema
+from datastore import MOVIE_COLUMNS, MOVIES_DIM, RATINGS_FACT_DIR, ROW_GROUP_ROWS, has_star_schema, normalize_zip, read_ratings
+from running_stats import STATE_COLUMNS, combine_partials, finalize_stats, partial_stats
+from zip_lookup import attach_geo, load_zip_arrays
+
+# ============================================================
+#  Goal:
+#  Append daily rating batches without re-running data_merging.py + adding_features.py.
+#  Persisted (count, mean, M2) accumulators per movie, per state and per ZIP are
+#  updated only for the keys that appear in the batch, and every update bumps a
+#  dataset version the dashboard cache keys on.
+#
+#  Once (after a full adding_features.py run):  python incremental_ingest.py init
+#  Per batch:                                   python incremental_ingest.py add new_ratings.csv
+# ============================================================
+
+INGEST_DIR = "ingest_state"
+VERSION_FILE = os.path.join(INGEST_DIR, "version.json")
+ACCUMULATORS = {
+    "movie": (["movie_id"], os.path.join(INGEST_DIR, "movie_acc.parquet")),
+    "state": (["State_Code", "State"], os.path.join(INGEST_DIR, "state_acc.parquet")),
+    "zip": (["State_Code", "Zip-code"], os.path.join(INGEST_DIR, "zip_acc.parquet")),
+}
+
+
+def fact_parts():
+    return sorted(os.path.basename(p) for p in glob.glob(os.path.join(RATINGS_FACT_DIR, "*.parquet")))
+
+
+def read_version():
+    if not os.path.exists(VERSION_FILE):
+        return None
+    with open(VERSION_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_version(info):
+    with open(VERSION_FILE, "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+
+
+def load_accumulator(name):
+    keys, path = ACCUMULATORS[name]
+    return pd.read_parquet(path).set_index(keys)
+
+
+def save_accumulator(name, acc):
+    _, path = ACCUMULATORS[name]
+    acc.reset_index().to_parquet(path, index=False)
+
+
+def geo_partials(ratings):
+    # State / ZIP partial states for ratings (rows with unknown ZIPs are dropped, as in the dashboard)
+    geo = attach_geo(ratings[["Zip-code", "rating"]], load_zip_arrays())
+    geo["State_Code"] = geo["State_Code"].astype(str)
+    geo["State"] = geo["State"].astype(str)
+    geo["Zip-code"] = geo["Zip-code"].astype(str)
+    return {name: partial_stats(geo, ACCUMULATORS[name][0]) for name in ("state", "zip")}
+
+
+def init_state():
+    """Build all accumulators from the current star schema (one full pass, done once)."""
+    if not has_star_schema():
+        raise SystemExit("No ratings fact table / movies dimension found - run adding_features.py first.")
+    os.makedirs(INGEST_DIR, exist_ok=True)
+
+    print("Building accumulators from the full ratings table...")
+    ratings = read_ratings(["movie_id", "Zip-code", "rating"], source="star")
+    partials = geo_partials(ratings)
+    partials["movie"] = partial_stats(ratings[ratings["movie_id"] >= 0], ["movie_id"])
+    for name, acc in partials.items():
+        save_accumulator(name, acc)
+
+    info = {"version": 1, "rows": len(ratings), "fact_parts": fact_parts(), "batches": []}
+    write_version(info)
+    print(f"Dataset version 1: {len(ratings):,} ratings")
+    return info
+
+
+def update_accumulator(name, partial):
+    # Only the keys present in the batch are touched
+    acc = load_accumulator(name)
+    touched = partial.index
+    known = touched.isin(acc.index)
+    merged = combine_partials(acc.loc[touched[known]], partial[known])
+
+    acc.loc[merged.index, STATE_COLUMNS] = merged[STATE_COLUMNS]
+    acc = pd.concat([acc, partial[~known]])
+    save_accumulator(name, acc)
+    return acc.loc[touched]
+
+
+def assign_movie_ids(batch, dim):
+    # Existing (Title, Release_Year) -> its movie_id; unseen movies get new ids appended to the dimension
+    dim_keys = pd.MultiIndex.from_arrays(
+        [dim["Title"], pd.to_numeric(dim["Release_Year"], errors="coerce")], names=MOVIE_KEYS)
+    batch_keys = pd.MultiIndex.from_arrays(
+        [batch["Title"], pd.to_numeric(batch["Release_Year"], errors="coerce")], names=MOVIE_KEYS)
+
+    ids = pd.Series(dim["movie_id"].to_numpy(), index=dim_keys).reindex(batch_keys).to_numpy()
+    has_key = batch["Title"].notna().to_numpy() & batch_keys.get_level_values(1).notna()
+    new = np.isnan(ids) & has_key
+    if new.any():
+        new_movies = batch.loc[new, [c for c in MOVIE_COLUMNS if c in batch.columns]].drop_duplicates(MOVIE_KEYS)
+        new_movies["movie_id"] = np.arange(len(new_movies)) + int(dim["movie_id"].max()) + 1
+        dim = pd.concat([dim, new_movies], ignore_index=True)
+        return assign_movie_ids(batch, dim)
+
+    return np.where(np.isnan(ids), -1, ids).astype("int32"), dim
+
+
+def add_batch(batch_path):
+    info = read_version()
+    if info is None:
+        raise SystemExit("No ingest state yet - run: python incremental_ingest.py init")
+    t0 = time.perf_counter()
+    version = info["version"] + 1
+
+    batch = pd.read_csv(batch_path, low_memory=False)
+    batch["Zip-code"] = normalize_zip(batch["Zip-code"])
+
+    # 1. movie ids (new movies are appended to the dimension without metadata)
+    dim = pd.read_parquet(MOVIES_DIM)
+    movie_id, dim = assign_movie_ids(batch, dim)
+    dim["Decade"] = (pd.to_numeric(dim["Release_Year"], errors="coerce") // 10) * 10
+
+    # 2. append the batch to the fact table as one more part, same schema as the others
+    fact = batch.drop(columns=[c for c in MOVIE_COLUMNS if c in batch.columns])
+    fact.insert(0, "movie_id", movie_id)
+    schema = fact_schema(pq.read_schema(os.path.join(RATINGS_FACT_DIR, fact_parts()[0])))
+    table = pa.Table.from_pandas(compact_fact(fact), preserve_index=False).select(schema.names).cast(schema)
+    part_name = f"part-v{version:05d}.parquet"
+    pq.write_table(table, os.path.join(RATINGS_FACT_DIR, part_name), row_group_size=ROW_GROUP_ROWS)
+
+    # 3. accumulators: only affected movies / states / ZIPs
+    partials = geo_partials(fact)
+    partials["movie"] = partial_stats(fact[fact["movie_id"] >= 0], ["movie_id"])
+    updated = {name: update_accumulator(name, partial) for name, partial in partials.items()}
+
+    # 4. Rating_Count / Avg_Rating / Controversy_Score of the affected movies in the dimension
+    stats = finalize_stats(updated["movie"])
+    rows = dim.set_index("movie_id").index.get_indexer(stats.index)
+    for col in stats.columns:
+        if col not in dim.columns:
+            dim[col] = np.nan
+        dim.loc[dim.index[rows], col] = stats[col].to_numpy()
+    dim.to_parquet(MOVIES_DIM, index=False)
+
+    # 5. new dataset version
+    info["version"] = version
+    info["rows"] += len(batch)
+    info["fact_parts"] = fact_parts()
+    info["batches"].append({"version": version, "file": os.path.basename(batch_path), "rows": len(batch),
+                            "ingested_at": time.strftime("%Y-%m-%d %H:%M:%S")})
+    write_version(info)
+
+    print(f"Dataset version {version}: +{len(batch):,} ratings, "
+          f"{len(updated['movie'])} movies / {len(updated['state'])} states / {len(updated['zip'])} ZIPs updated "
+          f"in {time.perf_counter() - t0:.2f}s")
+    return version
+
+
+def load_dashboard_accumulators():
+    """
+    (state_acc, zip_acc) if they are in sync with the current fact table, else None
+    (e.g. adding_features.py was re-run after init -> run init again).
+    """
+    info = read_version()
+    if info is None or info["fact_parts"] != fact_parts():
+        return None
+    return load_accumulator("state"), load_accumulator("zip")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "init":
+        init_state()
+    elif command == "add" and len(sys.argv) > 2:
+        for path in sys.argv[2:]:
+            add_batch(path)
+    else:
+        print("Usage: python incremental_ingest.py init | add <batch.csv> [...]")
@@ -0,0 +1,213 @@
+import argparse
+import ast
+import importlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+try:
+    import resource  # peak RSS per stage (not available on Windows)
+except ImportError:
+    resource = None
+
+import adding_features
+import data_merging
+import datastore
+import filter_index
+import geo_manifest
+import hexbin
+import rollup_cube
+import zcta_shards
+import zip_lookup
+from stamps import content_hash, list_files
+
+# ============================================================
+#  Goal:
+#  One entry point for the data pipeline. Every stage declares its inputs, outputs
+#  and code; a stage is skipped when the content hashes of its inputs and code are
+#  unchanged since its last successful run. Independent stages run concurrently.
+#
+#  Run:  python pipeline.py [--force] [--only STAGE ...] [--workers N]
+# ============================================================
+
+STAMP_FILE = os.path.join(".pipeline", "stamps.json")
+
+
+def code_files(module):
+    # The module's file and every repo module it imports, transitively (from the source, so the list can't go stale)
+    found, todo = set(), [module]
+    while todo:
+        name = todo.pop()
+        if name in found or not os.path.exists(f"{name}.py"):
+            continue  # stdlib / third-party
+        found.add(name)
+        with open(f"{name}.py", "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                todo += [alias.name.split(".")[0] for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                todo.append(node.module.split(".")[0])
+    return sorted(f"{name}.py" for name in found)
+
+
+# name -> (function "module:callable", kwargs, inputs, outputs, code files)
+# lite_csv derives usa_ratings_lite.csv from the features output: merge -> features -> lite_csv -> lite_extract
+STAGES = {
+    "merge": ("data_merging:run", {},
+              [data_merging.MAIN_FILE, data_merging.META_FILE],
+              [data_merging.OUTPUT_FILE],
+              code_files("data_merging")),
+    "features": ("adding_features:run_streaming", {"output_format": "star"},
+                 [adding_features.INPUT_FILE],
+                 [datastore.RATINGS_FACT_DIR, datastore.MOVIES_DIM],
+                 code_files("adding_features")),
+    "lite_csv": ("datastore:build_lite_csv", {},
+                 [datastore.RATINGS_FACT_DIR, datastore.MOVIES_DIM],
+                 [datastore.RATINGS_CSV],
+                 code_files("datastore")),
+    "lite_extract": ("datastore:build_columnar", {},
+                     [datastore.RATINGS_CSV],
+                     [datastore.RATINGS_PARQUET],
+                     code_files("datastore")),
+    "zip_lookup": ("zip_lookup:build_zip_lookup", {},
+                   [],
+                   [zip_lookup.ZIP_LOOKUP_PATH],
+                   code_files("zip_lookup")),
+    "zcta_shards": ("zcta_shards:build_shards", {},
+                    [zcta_shards.ZCTA_GEOJSON, zip_lookup.ZIP_LOOKUP_PATH],
+                    [os.path.join(zcta_shards.SHARD_DIR, zcta_shards.INDEX_FILE),
+                     geo_manifest.manifest_path(zcta_shards.ZCTA_GEOJSON)],
+                    code_files("zcta_shards")),
+    "filter_index": ("filter_index:build_filter_index", {},
+                     filter_index.FILTER_INDEX_INPUTS,
+                     [os.path.join(filter_index.FILTER_INDEX_DIR, filter_index.META_FILE)],
+                     code_files("filter_index")),
+    "rollup_cube": ("rollup_cube:build_cube", {},
+                    rollup_cube.CUBE_INPUTS,
+                    [rollup_cube.ROLLUP_CUBE],
+                    code_files("rollup_cube")),
+    "hexbins": ("hexbin:build_hexbins", {},
+                hexbin.HEXBIN_INPUTS,
+                [hexbin.HEXBIN_FILE],
+                code_files("hexbin")),
+}
+
+
+def stage_key(name, known):
+    _, kwargs, inputs, _, code = STAGES[name]
+    return content_hash(inputs, known) + content_hash(code, known) + json.dumps(kwargs, sort_keys=True)
+
+
+def dependencies(name):
+    # Stages whose outputs are this stage's inputs
+    inputs = set(STAGES[name][2])
+    return {other for other, stage in STAGES.items() if other != name and inputs & set(stage[3])}
+
+
+def downstream(name):
+    # Every stage that depends on this one, directly or through other stages
+    found, todo = set(), [name]
+    while todo:
+        current = todo.pop()
+        for other in STAGES:
+            if other not in found and current in dependencies(other):
+                found.add(other)
+                todo.append(other)
+    return found
+
+
+def run_stage(name):
+    """Runs in a fresh worker process: returns (rows, wall seconds, peak RSS in MB or None)."""
+    target, kwargs, *_ = STAGES[name]
+    module, func = target.split(":")
+    t0 = time.perf_counter()
+    rows = getattr(importlib.import_module(module), func)(**kwargs)
+    wall = time.perf_counter() - t0
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None
+    return rows, wall, peak_mb
+
+
+def load_stamps():
+    if not os.path.exists(STAMP_FILE):
+        return {"stages": {}, "files": {}}
+    with open(STAMP_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_stamps(stamps):
+    os.makedirs(os.path.dirname(STAMP_FILE), exist_ok=True)
+    with open(STAMP_FILE, "w", encoding="utf-8") as f:
+        json.dump(stamps, f, indent=2)
+
+
+def run_pipeline(only=None, force=False, workers=None):
+    stamps = load_stamps()
+    selected = set(only or STAGES)
+    pending = {name for name in STAGES if name in selected}
+    report = {}
+
+    # max_tasks_per_child=1: each stage gets its own process, so its peak RSS is its own
+    with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1) as pool:
+        running = {}
+        while pending or running:
+            for name in sorted(pending):
+                if dependencies(name) & (pending | set(running.values())):
+                    continue  # an upstream stage still has to (re)build our inputs
+                pending.discard(name)
+                missing = [p for p in STAGES[name][2] if not list_files(p)]
+                if missing:
+                    report[name] = (f"missing input: {', '.join(missing)}", None, None, None)
+                    continue
+                key = stage_key(name, stamps["files"])
+                outputs_ok = all(list_files(p) for p in STAGES[name][3])
+                if not force and outputs_ok and stamps["stages"].get(name) == key:
+                    report[name] = ("skipped", None, None, None)
+                    continue
+                if not force and outputs_ok and not STAGES[name][2]:
+                    # No local inputs (e.g. zip_lookup downloads from pgeocode): a prebuilt artifact is
+                    # kept as is, only --force rebuilds it
+                    report[name] = ("prebuilt", None, None, None)
+                    continue
+                print(f"[pipeline] running {name}...")
+                running[pool.submit(run_stage, name)] = name
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    rows, wall, peak_mb = future.result()
+                except Exception as e:
+                    report[name] = (f"FAILED: {e}", None, None, None)
+                    # Whatever depends on a failed stage, even through other stages, can't run
+                    for other in downstream(name) & pending:
+                        pending.discard(other)
+                        report[other] = (f"blocked by {name}", None, None, None)
+                    continue
+                stamps["stages"][name] = stage_key(name, stamps["files"])
+                save_stamps(stamps)
+                report[name] = ("ran", wall, rows, peak_mb)
+
+    print("-" * 30)
+    print(f"{'stage':<14} {'status':<10} {'wall (s)':>9} {'rows':>12} {'peak MB':>9}")
+    for name in STAGES:
+        if name not in report:
+            continue
+        status, wall, rows, peak_mb = report[name]
+        print(f"{name:<14} {status:<10} "
+              f"{'' if wall is None else f'{wall:.1f}':>9} "
+              f"{'' if rows is None else f'{rows:,}':>12} "
+              f"{'' if peak_mb is None else f'{peak_mb:.0f}':>9}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the data pipeline, skipping up-to-date stages.")
+    parser.add_argument("--force", action="store_true", help="re-run stages even if nothing changed")
+    parser.add_argument("--only", nargs="+", choices=list(STAGES), help="run only these stages")
+    parser.add_argument("--workers", type=int, default=None, help="max stages running at the same time")
+    args = parser.parse_args()
+    run_pipeline(only=args.only, force=args.force, workers=args.workers)
@@ -0,0 +1,93 @@
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# ============================================================
+#  Goal:
+#  Opt-in per-rerun timing for the dashboard: named sections (aggregates, filters,
+#  GeoJSON subset, figure build, plotly_chart serialization) plus hit/miss of every
+#  cached function. One record per rerun, shown in the sidebar and appended to a
+#  JSON-lines log for offline analysis.
+# ============================================================
+
+PROFILE_LOG = "profile_log.jsonl"
+
+_local = threading.local()  # the profile of the rerun running in this script thread
+
+
+class RunProfile:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.sections = {}  # name -> ms (summed if a section runs twice)
+        self.cache = {}     # cached function -> "hit" / "miss"
+        self._missed = set()
+
+    def add(self, name, t0):
+        # Time since t0 (a perf_counter value) into a section, for blocks too long to wrap in section()
+        self.sections[name] = self.sections.get(name, 0.0) + (time.perf_counter() - t0) * 1000
+
+    @contextmanager
+    def section(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, t0)
+
+    @contextmanager
+    def cache_call(self, name):
+        # Time the call as a section; it was a miss if the function body ran (see tracked)
+        self._missed.discard(name)
+        with self.section(name):
+            yield
+        self.cache[name] = "miss" if name in self._missed else "hit"
+
+    def mark_miss(self, name):
+        self._missed.add(name)
+
+    def record(self, **context):
+        return {"ts": time.strftime("%Y-%m-%d %H:%M:%S"), **context,
+                "total_ms": round((time.perf_counter() - self.t0) * 1000, 1),
+                "sections": {k: round(v, 1) for k, v in self.sections.items()},
+                "cache": dict(self.cache)}
+
+
+def start_run():
+    _local.profile = RunProfile()
+    return _local.profile
+
+
+def current():
+    profile = getattr(_local, "profile", None)
+    return profile if profile is not None else start_run()
+
+
+def tracked(cache_decorator):
+    """
+    Wrap a Streamlit cache decorator so every call records hit/miss and its time:
+        @tracked(st.cache_resource)
+        def get_aggregates(fingerprint): ...
+    """
+    def wrap(func):
+        @functools.wraps(func)
+        def body(*args, **kwargs):
+            current().mark_miss(func.__name__)  # only runs when the cache misses
+            return func(*args, **kwargs)
+
+        cached = cache_decorator(body)
+
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            with current().cache_call(func.__name__):
+                return cached(*args, **kwargs)
+
+        call.clear = cached.clear
+        return call
+    return wrap
+
+
+def log_record(record, path=PROFILE_LOG):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
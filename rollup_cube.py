@@ -0,0 +1,125 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from aggregates import aggregates_from_sums
+from datastore import MOVIES_DIM, RATINGS_FACT_DIR, has_star_schema, read_ratings
+from filter_index import movie_attributes, split_genres
+from stamps import input_stamp, stamp_is_current
+from zip_lookup import ZIP_LOOKUP_PATH, attach_geo, load_zip_arrays
+
+# ============================================================
+#  Goal:
+#  Offline rollup cube: (count, sum, sum of squares) of ratings per
+#  State x ZIP x Decade x Genres cell. Any slice by geography, decade and genre is a sum
+#  of cells, and mean / std / Weighted_Score / Delta are exact from the three sums, so
+#  the dashboard can run without loading a single raw rating row.
+#
+#  Genres is the movie's full genre set ("Action|Comedy"), not one genre per cell: every
+#  rating lands in exactly one cell, so summing cells never counts a rating twice.
+#  A genre filter selects the cells whose set contains that genre.
+#
+#  Build (after adding_features.py):  python rollup_cube.py
+# ============================================================
+
+ROLLUP_CUBE = "rollup_cube.parquet"
+CUBE_KEYS = ["State_Code", "State", "Zip-code", "Decade", "Genres"]
+CUBE_INPUTS = [RATINGS_FACT_DIR, MOVIES_DIM, ZIP_LOOKUP_PATH]  # exactly what build_cube reads
+UNKNOWN_DECADE = -1
+
+
+def movie_cells(movies):
+    # Per movie_id: Decade (UNKNOWN_DECADE if missing) and its sorted genre set as one string
+    cells = pd.DataFrame({"movie_id": movies["movie_id"].to_numpy()})
+    if "Decade" in movies.columns:
+        decade = pd.to_numeric(movies["Decade"], errors="coerce").fillna(UNKNOWN_DECADE)
+        cells["Decade"] = decade.astype("int16").to_numpy()
+    else:
+        cells["Decade"] = np.int16(UNKNOWN_DECADE)
+    if "Genres" in movies.columns:
+        cells["Genres"] = split_genres(movies["Genres"]).map(lambda g: "|".join(sorted(set(g)))).to_numpy()
+    else:
+        cells["Genres"] = ""
+    return cells.set_index("movie_id")
+
+
+def build_cube(out_path=ROLLUP_CUBE):
+    if not has_star_schema():
+        raise SystemExit("No ratings fact table / movies dimension found - run adding_features.py first.")
+    stamp = input_stamp(CUBE_INPUTS)
+
+    print("Reading ratings...")
+    geo = attach_geo(read_ratings(["movie_id", "Zip-code", "rating"], source="star"), load_zip_arrays())
+
+    # Movie attributes by a take() on movie_id (movie_id -1 -> unknown decade, no genres)
+    cells = movie_cells(movie_attributes())
+    cells = cells.reindex(range(-1, int(cells.index.max()) + 1))
+    cells["Decade"] = cells["Decade"].fillna(UNKNOWN_DECADE).astype("int16")
+    cells["Genres"] = cells["Genres"].fillna("")
+    pos = geo["movie_id"].to_numpy().astype(np.int64) + 1
+
+    rating = geo["rating"].to_numpy(dtype=np.float64)
+    rows = pd.DataFrame({
+        "State_Code": geo["State_Code"], "State": geo["State"], "Zip-code": geo["Zip-code"],
+        "Decade": cells["Decade"].to_numpy()[pos],
+        "Genres": pd.Categorical(cells["Genres"].to_numpy()[pos]),
+        "rating": rating, "rating_sq": rating * rating,
+    })
+    cube = rows.groupby(CUBE_KEYS, observed=True, sort=False).agg(
+        count=("rating", "count"), sum=("rating", "sum"), sumsq=("rating_sq", "sum")).reset_index()
+    cube["count"] = cube["count"].astype("int64")
+    for col in ["State_Code", "State", "Zip-code", "Genres"]:
+        cube[col] = cube[col].astype(str).astype("category")
+
+    # Input stamp in the file metadata: a cube built from other input contents is never used
+    table = pa.Table.from_pandas(cube, preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata, b"inputs_stamp": json.dumps(stamp).encode()})
+    pq.write_table(table, out_path)
+    print(f"Rollup cube: {len(geo):,} ratings -> {len(cube):,} cells "
+          f"({os.path.getsize(out_path) / 1e6:.1f} MB) -> {out_path}")
+    return len(cube)
+
+
+def load_cube(path=ROLLUP_CUBE, check=True):
+    # The cube, or None if it is missing or its input files changed content since it was built (check=False skips that)
+    if not os.path.exists(path):
+        return None
+    metadata = pq.read_schema(path).metadata or {}
+    if check and not stamp_is_current(json.loads(metadata.get(b"inputs_stamp", b"null")), CUBE_INPUTS):
+        return None
+    return pd.read_parquet(path)
+
+
+def cube_genres(cube):
+    return sorted({g for combo in cube["Genres"].cat.categories for g in combo.split("|") if g})
+
+
+def cube_decades(cube):
+    return sorted(d for d in cube["Decade"].unique().tolist() if d != UNKNOWN_DECADE)
+
+
+def cube_slice(cube, genre=None, decade=None, state_code=None):
+    # Cells of one slice (None = all values of that dimension)
+    mask = np.ones(len(cube), dtype=bool)
+    if genre is not None:
+        member = np.array([genre in combo.split("|") for combo in cube["Genres"].cat.categories])
+        mask &= member[cube["Genres"].cat.codes.to_numpy()]
+    if decade is not None:
+        mask &= cube["Decade"].to_numpy() == decade
+    if state_code is not None:
+        mask &= (cube["State_Code"] == state_code).to_numpy()
+    return cube[mask]
+
+
+def cube_aggregates(cube, genre=None, decade=None):
+    """(state_stats, zip_stats) of a slice, same columns as the aggregates computed from raw ratings."""
+    return aggregates_from_sums(cube_slice(cube, genre, decade))
+
+
+if __name__ == "__main__":
+    build_cube(*sys.argv[1:2])
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+# ============================================================
+#  Mergeable running statistics (count, mean, M2) per key.
+#  Partial states from different chunks/batches combine exactly
+#  (Chan et al. parallel variance), so mean and std never need all rows at once.
+# ============================================================
+
+STATE_COLUMNS = ["count", "mean", "M2"]
+
+
+def partial_stats(df, keys, value="rating"):
+    # One partial state per key for this chunk (float64, whatever the stored rating dtype is)
+    df = df.assign(**{value: df[value].astype("float64")})
+    g = df.groupby(keys, observed=True, sort=False)[value]
+    out = pd.DataFrame({"count": g.count(), "mean": g.mean()})
+    out["M2"] = g.var(ddof=0).fillna(0) * out["count"]
+    out = out[out["count"] > 0]
+    out["count"] = out["count"].astype("int64")
+    return out
+
+
+def combine_partials(a, b):
+    """
+    Merge two partial-state frames (indexed by key) into one.
+    Keys missing on one side behave like an empty state.
+    """
+    if a is None or a.empty:
+        return b.copy()
+    if b is None or b.empty:
+        return a.copy()
+    a, b = a.align(b, join="outer", fill_value=0)
+
+    n = a["count"] + b["count"]
+    delta = b["mean"] - a["mean"]
+    out = pd.DataFrame(index=a.index)
+    out["count"] = n.astype("int64")
+    out["mean"] = a["mean"] + delta * b["count"] / n
+    out["M2"] = a["M2"] + b["M2"] + delta ** 2 * a["count"] * b["count"] / n
+    return out
+
+
+def finalize_stats(acc):
+    # -> the column names the rest of the project uses (std with ddof=1, 0 for a single rating)
+    count = acc["count"]
+    std = np.sqrt(acc["M2"] / (count - 1).where(count > 1))
+    return pd.DataFrame({
+        "Rating_Count": count,
+        "Avg_Rating": acc["mean"],
+        "Controversy_Score": std.fillna(0),
+    }, index=acc.index)
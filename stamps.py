@@ -0,0 +1,57 @@
+import hashlib
+import os
+
+# ============================================================
+#  Content hashes of input files, shared by the pipeline (is a stage up to date?) and the
+#  builders of derived artifacts (filter index, rollup cube, hex bins), which store an
+#  input stamp next to what they write. An artifact is current when the files it was
+#  built from still have the same content - touching or rewriting an unrelated file,
+#  or the same bytes with a new mtime, doesn't make it stale.
+# ============================================================
+
+
+def list_files(path):
+    if os.path.isdir(path):
+        return sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    return [path] if os.path.exists(path) else []
+
+
+def file_hash(path, known):
+    # Re-hash only when size/mtime changed since the hash we stored
+    st = os.stat(path)
+    cached = known.get(path)
+    if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+        return cached["sha256"]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    known[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": h.hexdigest()}
+    return known[path]["sha256"]
+
+
+def content_hash(paths, known):
+    h = hashlib.sha256()
+    for path in paths:
+        files = list_files(path)
+        if not files:
+            h.update(f"{path}:missing;".encode())
+        for file in files:
+            h.update(f"{file}:{file_hash(file, known)};".encode())
+    return h.hexdigest()
+
+
+def input_stamp(paths):
+    """
+    Stamp of the files an artifact is built from: their content hash, plus the per-file
+    (size, mtime, sha256) it came from so checking it later only re-hashes files that changed.
+    Take it before reading the inputs: a concurrent rewrite then makes the artifact stale, never wrongly current.
+    """
+    files = {}
+    return {"inputs": list(paths), "hash": content_hash(paths, files), "files": files}
+
+
+def stamp_is_current(stamp, paths):
+    if not stamp or stamp.get("inputs") != list(paths):
+        return False
+    return content_hash(paths, dict(stamp.get("files", {}))) == stamp.get("hash")
@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_merging import MAIN_FILE, META_FILE
+from datastore import RATINGS_CSV
+from zcta_shards import ZCTA_GEOJSON, ZCTA_KEY
+from zip_lookup import ZIP_LOOKUP_PATH
+
+# ============================================================
+#  Goal:
+#  Seeded generator of MovieLens-shaped inputs at any size, so the pipeline and the
+#  dashboard can be measured at 1M / 10M / 25M rows without the real multi-GB CSVs.
+#  Writes, into one directory, the same file names the scripts read:
+#    final_movies_dataset.csv  movies_metadata.csv  usa_ratings_lite.csv
+#    zip_lookup_v1.parquet     zcta.geojson.json (one small square per ZIP)
+#  Same seed + same size -> byte-identical files.
+#
+#  Run:  python synth_data.py --rows 10000000 [--seed 42] [--out synthetic_10M]
+# ============================================================
+
+MANIFEST_FILE = "synthetic_manifest.json"
+CHUNK_ROWS = 1_000_000
+
+# State, name, first and last 5-digit ZIP of its range
+STATES = [
+    ("AL", "Alabama", 35000, 36999), ("AK", "Alaska", 99500, 99999), ("AZ", "Arizona", 85000, 86599),
+    ("AR", "Arkansas", 71600, 72999), ("CA", "California", 90000, 96199), ("CO", "Colorado", 80000, 81699),
+    ("CT", "Connecticut", 6000, 6999), ("DE", "Delaware", 19700, 19999), ("DC", "District of Columbia", 20000, 20599),
+    ("FL", "Florida", 32000, 34999), ("GA", "Georgia", 30000, 31999), ("HI", "Hawaii", 96700, 96899),
+    ("ID", "Idaho", 83200, 83899), ("IL", "Illinois", 60000, 62999), ("IN", "Indiana", 46000, 47999),
+    ("IA", "Iowa", 50000, 52899), ("KS", "Kansas", 66000, 67999), ("KY", "Kentucky", 40000, 42799),
+    ("LA", "Louisiana", 70000, 71599), ("ME", "Maine", 3900, 4999), ("MD", "Maryland", 20600, 21999),
+    ("MA", "Massachusetts", 1000, 2799), ("MI", "Michigan", 48000, 49999), ("MN", "Minnesota", 55000, 56799),
+    ("MS", "Mississippi", 38600, 39799), ("MO", "Missouri", 63000, 65899), ("MT", "Montana", 59000, 59999),
+    ("NE", "Nebraska", 68000, 69399), ("NV", "Nevada", 88900, 89899), ("NH", "New Hampshire", 3000, 3899),
+    ("NJ", "New Jersey", 7000, 8999), ("NM", "New Mexico", 87000, 88499), ("NY", "New York", 10000, 14999),
+    ("NC", "North Carolina", 27000, 28999), ("ND", "North Dakota", 58000, 58899), ("OH", "Ohio", 43000, 45999),
+    ("OK", "Oklahoma", 73000, 74999), ("OR", "Oregon", 97000, 97999), ("PA", "Pennsylvania", 15000, 19699),
+    ("RI", "Rhode Island", 2800, 2999), ("SC", "South Carolina", 29000, 29999), ("SD", "South Dakota", 57000, 57799),
+    ("TN", "Tennessee", 37000, 38599), ("TX", "Texas", 75000, 79999), ("UT", "Utah", 84000, 84799),
+    ("VT", "Vermont", 5000, 5999), ("VA", "Virginia", 22000, 24699), ("WA", "Washington", 98000, 99499),
+    ("WV", "West Virginia", 24700, 26899), ("WI", "Wisconsin", 53000, 54999), ("WY", "Wyoming", 82000, 83199),
+]
+GENRES = ["Action", "Adventure", "Animation", "Children's", "Comedy", "Crime", "Documentary", "Drama",
+          "Fantasy", "Film-Noir", "Horror", "Musical", "Mystery", "Romance", "Sci-Fi", "Thriller", "War", "Western"]
+TITLE_WORDS = ["love", "night", "man", "story", "return", "king", "dark", "city", "last", "war", "dead", "home",
+               "girl", "blue", "star", "day", "life", "game", "house", "world", "time", "heart", "river", "fire",
+               "secret", "lost", "summer", "dream", "road", "ghost", "angel", "brother", "devil", "island", "moon"]
+AGES = [1, 18, 25, 35, 45, 50, 56]  # MovieLens age buckets
+
+
+def make_zips(rng, n_zips):
+    # n_zips distinct ZIPs spread over the states' real ranges; lon/lat roughly follow the ZIP order (east -> west)
+    ranges = np.array([(lo, hi) for _, _, lo, hi in STATES])
+    pool = np.concatenate([np.arange(lo, hi + 1) for lo, hi in ranges])
+    zips = np.sort(rng.choice(pool, size=min(n_zips, len(pool)), replace=False))
+    by_start = np.argsort(ranges[:, 0])
+    state = by_start[np.searchsorted(ranges[by_start, 0], zips, side="right") - 1]
+
+    codes = np.array([s[0] for s in STATES])
+    names = np.array([s[1] for s in STATES])
+    return pd.DataFrame({
+        "zip": zips.astype("int32"),
+        "lat": (rng.uniform(26, 48, len(zips))).astype("float32"),
+        "lon": (-68 - zips / 100000 * 56 + rng.normal(0, 1.5, len(zips))).astype("float32"),
+        "City_Name": pd.Categorical(np.char.add("City ", (zips // 100).astype(str))),
+        "State_Code": pd.Categorical(codes[state]),
+        "State": pd.Categorical(names[state]),
+    })
+
+
+def make_movies(rng, n_movies):
+    words = rng.choice(TITLE_WORDS, size=(n_movies, 3))
+    n_words = rng.integers(1, 4, n_movies)
+    titles = [" ".join(w[:k]).title() for w, k in zip(words, n_words)]
+    titles = [f"{t} {i}" if i % 3 else t for i, t in enumerate(titles)]  # some titles repeat across years
+    years = np.clip(np.rint(2020 - rng.gamma(2.0, 12.0, n_movies)), 1920, 2020).astype(int)
+
+    genre_sets = []
+    for k in rng.integers(1, 4, n_movies):
+        genre_sets.append("|".join(sorted(rng.choice(GENRES, size=k, replace=False))))
+    return pd.DataFrame({"Title": titles, "Release_Year": years, "Genres": genre_sets})
+
+
+def make_metadata(rng, movies):
+    # ~90% of the movies, a few with typos or the year off by one, plus unrelated extra rows
+    meta = movies.sample(frac=0.9, random_state=int(rng.integers(1 << 31))).copy()
+    typo = rng.random(len(meta)) < 0.05
+    meta.loc[typo, "Title"] = meta.loc[typo, "Title"].str.replace("e", "a", n=1, regex=False)
+    year = meta["Release_Year"] + rng.choice([0, 0, 0, 1, -1], len(meta))
+
+    n = len(meta)
+    budget = np.where(rng.random(n) < 0.7, np.rint(rng.lognormal(16, 1.2, n)), 0)
+    revenue = np.where(rng.random(n) < 0.6, np.rint(budget * rng.lognormal(0.4, 1.0, n)), np.nan)
+    return pd.DataFrame({
+        "title": meta["Title"].to_numpy(),
+        "release_date": pd.to_datetime(pd.DataFrame({"year": year, "month": rng.integers(1, 13, n), "day": 1})
+                                       ).dt.strftime("%Y-%m-%d").to_numpy(),
+        "revenue": revenue,
+        "budget": budget,
+        "overview": "Synthetic overview.",
+        "poster_path": [f"/p{i}.jpg" for i in range(n)],
+        "runtime": rng.integers(70, 180, n),
+        "original_language": rng.choice(["en", "en", "en", "fr", "es", "ja"], n),
+    })
+
+
+def generate(out_dir, rows, seed=42):
+    t0 = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    n_movies = int(np.clip(rows // 250, 500, 60000))
+    n_users = int(np.clip(rows // 150, 100, 300000))
+    n_zips = int(np.clip(rows // 400, 200, 30000))
+
+    zips = make_zips(rng, n_zips)
+    zips.to_parquet(os.path.join(out_dir, ZIP_LOOKUP_PATH), index=False)
+    movies = make_movies(rng, n_movies)
+    make_metadata(rng, movies).to_csv(os.path.join(out_dir, META_FILE), index=False)
+
+    # Users: home ZIP (busy ZIPs get more users), gender, age bucket, occupation
+    zip_weight = rng.lognormal(0, 1.3, len(zips))
+    users = pd.DataFrame({
+        "user_id": np.arange(1, n_users + 1),
+        "Zip-code": np.char.zfill(rng.choice(zips["zip"].to_numpy(), n_users, p=zip_weight / zip_weight.sum())
+                                  .astype(str), 5),
+        "Gender": rng.choice(["M", "F"], n_users, p=[0.7, 0.3]),
+        "Age": rng.choice(AGES, n_users),
+        "Occupation": rng.integers(0, 21, n_users),
+    })
+    user_activity = rng.lognormal(0, 1.2, n_users)
+    user_p = user_activity / user_activity.sum()
+    movie_pop = rng.lognormal(0, 1.5, n_movies)
+    movie_p = movie_pop / movie_pop.sum()
+    movie_mean = np.clip(rng.normal(3.5, 0.5, n_movies), 1.5, 4.8)
+
+    # Ratings in chunks, each from its own child seed, so memory stays flat at any size
+    main_path, lite_path = os.path.join(out_dir, MAIN_FILE), os.path.join(out_dir, RATINGS_CSV)
+    seeds = np.random.SeedSequence(seed).spawn(-(-rows // CHUNK_ROWS))
+    for i, child in enumerate(seeds):
+        crng = np.random.default_rng(child)
+        n = min(CHUNK_ROWS, rows - i * CHUNK_ROWS)
+        u = crng.choice(n_users, n, p=user_p)
+        m = crng.choice(n_movies, n, p=movie_p)
+        rating = np.clip(np.rint(crng.normal(movie_mean[m], 1.0)), 1, 5).astype(int)
+        chunk = pd.concat([
+            users.iloc[u][["user_id", "Gender", "Age", "Occupation", "Zip-code"]].reset_index(drop=True),
+            movies.iloc[m].reset_index(drop=True),
+        ], axis=1)
+        chunk.insert(1, "rating", rating)
+        chunk.to_csv(main_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        chunk[["user_id", "Zip-code", "rating", "Title"]].to_csv(
+            lite_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+
+    # ZCTA-like geometry: a small square around every ZIP
+    half = 0.02
+    features = [{
+        "type": "Feature",
+        "properties": {ZCTA_KEY: f"{z:05d}"},
+        "geometry": {"type": "Polygon", "coordinates": [[
+            [round(lon - half, 4), round(lat - half, 4)], [round(lon + half, 4), round(lat - half, 4)],
+            [round(lon + half, 4), round(lat + half, 4)], [round(lon - half, 4), round(lat + half, 4)],
+            [round(lon - half, 4), round(lat - half, 4)]]]},
+    } for z, lat, lon in zip(zips["zip"].tolist(), zips["lat"].tolist(), zips["lon"].tolist())]
+    with open(os.path.join(out_dir, ZCTA_GEOJSON), "w", encoding="utf-8") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+
+    manifest = {"seed": seed, "rows": rows, "movies": n_movies, "users": n_users, "zips": len(zips)}
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Synthetic dataset: {rows:,} ratings, {n_movies:,} movies, {n_users:,} users, {len(zips):,} ZIPs "
+          f"-> {out_dir}/ in {time.perf_counter() - t0:.1f}s")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic MovieLens-shaped dataset.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="number of ratings (e.g. 1M, 10M, 25M)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None, help="output directory (default: synthetic_<rows>)")
+    args = parser.parse_args()
+    generate(args.out or f"synthetic_{args.rows}", args.rows, args.seed)
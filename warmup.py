@@ -0,0 +1,74 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aggregates import dataset_fingerprint, load_aggregates, load_dashboard_ratings
+from zcta_shards import ZCTA_GEOJSON, build_shards, has_shards, load_index, load_state_features, pick_shard_dir
+
+# ============================================================
+#  Goal:
+#  Dashboard startup without the serial "geometry, then data" wait: aggregates and
+#  geometry indexes load in parallel, and the shards of the busiest states are
+#  prefetched in the background.
+#
+#  Before starting the server:  python warmup.py && streamlit run Vizu_1.py
+#  (fills the on-disk aggregate cache and builds shards, so the first session only reads small files)
+# ============================================================
+
+PREFETCH_STATES = 5
+
+logger = logging.getLogger("warmup")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s [%(name)s] %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def warm_geometry():
+    # Shard index of every geometry variant the drilldown may pick
+    shard_dirs = {pick_shard_dir(n) for n in (0, 50, 400, 1500)} - {None}
+    for shard_dir in shard_dirs:
+        load_index(shard_dir)
+    return shard_dirs
+
+
+def prefetch_states(zip_stats, n=PREFETCH_STATES):
+    # Parse the shards of the states with the most ratings into the LRU before anyone clicks them
+    busiest = zip_stats.groupby("State_Code", observed=True)["Rating_Count"].sum().nlargest(n)
+    for state in busiest.index:
+        shard_dir = pick_shard_dir(int((zip_stats["State_Code"] == state).sum()))
+        if shard_dir is not None:
+            load_state_features(str(state), shard_dir)
+
+
+def warm_start(fingerprint=None, load_data=load_dashboard_ratings, prefetch=True):
+    """
+    (state_stats, zip_stats) for the dashboard, with the geometry indexes loaded at the same time.
+    Shard prefetching continues in a background thread after this returns.
+    """
+    t0 = time.perf_counter()
+    fingerprint = fingerprint or dataset_fingerprint()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        aggregates = pool.submit(load_aggregates, fingerprint, load_data)
+        geometry = pool.submit(warm_geometry)
+        state_stats, zip_stats = aggregates.result()
+        shard_dirs = geometry.result()
+    logger.info("warm start: aggregates + %d geometry index(es) in %.2fs", len(shard_dirs), time.perf_counter() - t0)
+
+    if prefetch and zip_stats is not None and shard_dirs:
+        threading.Thread(target=prefetch_states, args=(zip_stats,), daemon=True).start()
+    return state_stats, zip_stats
+
+
+def log_first_paint(t0):
+    logger.info("time to first paint: %.2fs", time.perf_counter() - t0)
+
+
+if __name__ == "__main__":
+    if not has_shards() and os.path.exists(ZCTA_GEOJSON):
+        build_shards()
+    warm_start(prefetch=False)
+    print("Warm-up done: aggregate cache and geometry shards are ready.")
@@ -0,0 +1,136 @@
+import json
+import os
+import sys
+from functools import lru_cache
+
+from zip_lookup import N_ZIPS, load_zip_arrays
+
+# ============================================================
+#  Goal:
+#  Split the national ZCTA GeoJSON into one small file per state plus a
+#  ZIP -> (state, position) index, so the drilldown only parses the features
+#  of the state that was clicked.
+#
+#  Build:  python zcta_shards.py [zcta.geojson.json] [zcta_shards]
+# ============================================================
+
+ZCTA_GEOJSON = "zcta.geojson.json"
+SHARD_DIR = "zcta_shards"
+INDEX_FILE = "index.json"
+ZCTA_KEY = "ZCTA5CE10"
+UNASSIGNED = "_unassigned"  # ZCTAs the ZIP lookup doesn't know
+
+# Simplified variants written by convert_zcta_to_geojson.py (one shard dir each), lightest first,
+# with the smallest drilldown (number of ZIPs on screen) each one still looks fine for
+VARIANT_MIN_ZIPS = [("low", 1500), ("medium", 400), ("high", 50), ("full", 0)]
+
+
+def detect_feature_key(properties):
+    # Same rule the dashboard used: prefer ZCTA5CE10, else the first ZCTA/zip-looking property
+    if ZCTA_KEY in properties:
+        return ZCTA_KEY
+    for k in properties.keys():
+        if "ZCTA" in k or "zip" in k.lower():
+            return k
+    return ZCTA_KEY
+
+
+def build_shards(geojson_path=ZCTA_GEOJSON, out_dir=SHARD_DIR):
+    from geo_manifest import read_manifest, summarize_features, write_manifest
+
+    print(f"Loading {geojson_path}...")
+    with open(geojson_path, "r", encoding="utf-8") as f:
+        features = json.load(f)["features"]
+
+    # Manifest sidecar (geo_manifest.py): written from the features we already hold if missing/stale
+    manifest = read_manifest(geojson_path) or write_manifest(geojson_path, summarize_features(features))
+    feature_key = manifest["feature_key"]
+    state_codes, state_names = load_zip_arrays()["State_Code"]
+
+    print("Partitioning features by state...")
+    shards = {}
+    zip_index = {}
+    for feat in features:
+        zip_code = str(feat["properties"].get(feature_key, "")).zfill(5)
+        # Store the key already normalized, so nobody has to zfill at runtime
+        feat["properties"][feature_key] = zip_code
+
+        state = UNASSIGNED
+        if zip_code.isdigit() and int(zip_code) < N_ZIPS:
+            code = state_codes[int(zip_code)]
+            if code >= 0:
+                state = str(state_names[code])
+
+        shard = shards.setdefault(state, [])
+        zip_index[zip_code] = [state, len(shard)]
+        shard.append(feat)
+
+    os.makedirs(out_dir, exist_ok=True)
+    for state, shard in shards.items():
+        with open(os.path.join(out_dir, f"{state}.geojson"), "w", encoding="utf-8") as f:
+            json.dump({"type": "FeatureCollection", "features": shard}, f, separators=(",", ":"))
+
+    index = {
+        "source": os.path.basename(geojson_path),
+        "feature_key": feature_key,
+        "states": {state: len(shard) for state, shard in sorted(shards.items())},
+        "zips": zip_index,
+    }
+    with open(os.path.join(out_dir, INDEX_FILE), "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+
+    print(f"Saved {len(features)} features in {len(shards)} shards to {out_dir}/")
+    return len(features)
+
+
+def has_shards(shard_dir=SHARD_DIR):
+    return pick_shard_dir(0, shard_dir) is not None
+
+
+def pick_shard_dir(n_zips, shard_dir=SHARD_DIR):
+    """
+    Lightest built geometry variant that suits a view with n_zips ZIPs.
+    Falls back to any built variant, then to a flat (un-variant) shard dir, else None.
+    """
+    built = [(name, min_zips) for name, min_zips in VARIANT_MIN_ZIPS
+             if os.path.exists(os.path.join(shard_dir, name, INDEX_FILE))]
+    for name, min_zips in built:
+        if n_zips >= min_zips:
+            return os.path.join(shard_dir, name)
+    if built:
+        return os.path.join(shard_dir, built[-1][0])
+    if os.path.exists(os.path.join(shard_dir, INDEX_FILE)):
+        return shard_dir
+    return None
+
+
+@lru_cache(maxsize=4)
+def load_index(shard_dir=SHARD_DIR):
+    with open(os.path.join(shard_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=8)
+def load_state_features(state_code, shard_dir=SHARD_DIR):
+    """
+    ZIP -> feature dict for one state, parsed lazily from its shard.
+    The LRU keeps the most recently opened states in memory (shared by all sessions).
+    """
+    path = os.path.join(shard_dir, f"{state_code}.geojson")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        features = json.load(f)["features"]
+    feature_key = load_index(shard_dir)["feature_key"]
+    return {feat["properties"][feature_key]: feat for feat in features}
+
+
+def state_geojson(state_code, zip_codes, shard_dir=SHARD_DIR):
+    # FeatureCollection with only the requested ZIPs of one state (dict lookups, no scan)
+    by_zip = load_state_features(state_code, shard_dir)
+    features = [by_zip[z] for z in zip_codes if z in by_zip]
+    return {"type": "FeatureCollection", "features": features}
+
+
+if __name__ == "__main__":
+    build_shards(*sys.argv[1:3])
@@ -0,0 +1,130 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# ============================================================
+#  Goal:
+#  Prebuilt, versioned ZIP -> geo lookup table, so the dashboard never has to
+#  build a pgeocode.Nominatim object (or download its table) on a cold start.
+#
+#  Rebuild:  python zip_lookup.py build
+#  Check:    python zip_lookup.py check   (reports rating ZIPs that get dropped)
+# ============================================================
+
+ZIP_LOOKUP_VERSION = 1
+ZIP_LOOKUP_PATH = f"zip_lookup_v{ZIP_LOOKUP_VERSION}.parquet"
+GEO_COLUMNS = ["lat", "lon", "City_Name", "State_Code", "State"]
+N_ZIPS = 100000  # 5-digit ZIPs -> array index 0..99999
+
+
+def build_zip_lookup(out_path=ZIP_LOOKUP_PATH):
+    import pgeocode
+
+    print("Querying pgeocode for every 5-digit ZIP...")
+    nomi = pgeocode.Nominatim("us")
+    all_zips = np.char.zfill(np.arange(N_ZIPS).astype(str), 5)
+    geo_data = nomi.query_postal_code(all_zips)
+    geo_data = geo_data.dropna(subset=["latitude", "longitude", "state_code"])
+
+    lookup = pd.DataFrame({
+        "zip": geo_data["postal_code"].astype("int32").to_numpy(),
+        "lat": geo_data["latitude"].astype("float32").to_numpy(),
+        "lon": geo_data["longitude"].astype("float32").to_numpy(),
+        "City_Name": geo_data["place_name"].astype("category").to_numpy(),
+        "State_Code": geo_data["state_code"].astype(str).str.upper().astype("category").to_numpy(),
+        "State": geo_data["state_name"].astype("category").to_numpy(),
+    })
+    lookup.to_parquet(out_path, index=False)
+    print(f"Saved {len(lookup)} ZIPs to {out_path}")
+    return len(lookup)
+
+
+def load_zip_arrays(path=ZIP_LOOKUP_PATH):
+    """
+    Dense arrays indexed by integer ZIP (0..99999).
+    Categorical columns are returned as (codes array, categories) so the join stays a pure take().
+    Never builds the lookup itself (a pgeocode query for every ZIP): a missing file is an error.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"ZIP lookup {path} is missing - build it with: python zip_lookup.py build "
+                                f"(or python pipeline.py)")
+    lookup = pd.read_parquet(path)
+    zips = lookup["zip"].to_numpy()
+
+    arrays = {"valid": np.zeros(N_ZIPS, dtype=bool)}
+    arrays["valid"][zips] = True
+    for col in GEO_COLUMNS:
+        s = lookup[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            codes = np.full(N_ZIPS, -1, dtype=np.int32)
+            codes[zips] = s.cat.codes.to_numpy()
+            arrays[col] = (codes, s.cat.categories)
+        else:
+            values = np.full(N_ZIPS, np.nan, dtype=s.dtype)
+            values[zips] = s.to_numpy()
+            arrays[col] = values
+    return arrays
+
+
+def zip_to_int(zip_series):
+    # Works on the categorical Zip-code column: converts the (few) categories, then maps the codes
+    if isinstance(zip_series.dtype, pd.CategoricalDtype):
+        cat_ints = pd.to_numeric(zip_series.cat.categories, errors="coerce").fillna(-1).astype(np.int32).to_numpy()
+        cat_ints = np.append(cat_ints, -1)  # code -1 (NaN) -> -1
+        return cat_ints[zip_series.cat.codes.to_numpy()]
+    return pd.to_numeric(zip_series, errors="coerce").fillna(-1).astype(np.int32).to_numpy()
+
+
+def attach_geo(df, arrays, zip_col="Zip-code"):
+    # Array lookup by integer ZIP instead of a string merge; rows with unknown ZIPs are dropped
+    zip_int = zip_to_int(df[zip_col])
+    in_range = (zip_int >= 0) & (zip_int < N_ZIPS)
+    keep = in_range.copy()
+    keep[in_range] = arrays["valid"][zip_int[in_range]]
+
+    out = df[keep].reset_index(drop=True)
+    idx = zip_int[keep]
+    for col in GEO_COLUMNS:
+        values = arrays[col]
+        if isinstance(values, tuple):
+            codes, categories = values
+            out[col] = pd.Categorical.from_codes(codes[idx], categories=categories)
+        else:
+            out[col] = values[idx]
+    return out
+
+
+def check_zip_lookup(path=ZIP_LOOKUP_PATH):
+    from datastore import read_ratings
+
+    print(f"Checking rating ZIPs against {path}...")
+    zips = read_ratings(["Zip-code"])["Zip-code"]
+    arrays = load_zip_arrays(path)
+
+    counts = zips.value_counts()
+    counts = counts[counts > 0]
+    zip_int = zip_to_int(pd.Series(pd.Categorical(counts.index.astype(str))))
+    found = np.zeros(len(zip_int), dtype=bool)
+    in_range = (zip_int >= 0) & (zip_int < N_ZIPS)
+    found[in_range] = arrays["valid"][zip_int[in_range]]
+
+    dropped = counts[~found]
+    print("-" * 30)
+    print(f"Distinct ZIPs: {len(counts)}  |  Dropped: {len(dropped)}")
+    print(f"Rating rows dropped: {int(dropped.sum())} of {int(counts.sum())}")
+    if not dropped.empty:
+        print("\nDropped ZIPs (most ratings first):")
+        print(dropped.head(50).to_string())
+    return dropped
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if command == "build":
+        build_zip_lookup()
+    elif command == "check":
+        check_zip_lookup()
+    else:
+        print("Usage: python zip_lookup.py [build | check]")